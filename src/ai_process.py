@@ -0,0 +1,257 @@
+from seekers_types import *
+import utils
+
+import os
+import sys
+import time
+import pickle
+import marshal
+import hashlib
+import traceback
+import collections
+import importlib.util
+import multiprocessing as mp
+
+
+# Every ai lives in its own worker process. Each tick, the game sends the
+# pickled snapshot to all workers at once and then collects the orders
+# (target and magnet strength of every own seeker) until a deadline.
+# An ai that is too late keeps its previous orders; its late answer is
+# thrown away, and it gets no new request until it has answered.
+#
+# The ais are compiled in the game's process, so that the compiled code can
+# be cached there (see cached_code), and sent to the worker marshalled.
+
+class AiProcess:
+  def __init__(self, filename):
+    self.filename = filename
+    self.request_id = 0
+    self.pending = None
+    self.alive = True
+    # seconds the ai took for its last collected orders, in the worker
+    self.think_time = 0.0
+    self.connection, child_connection = mp.Pipe()
+    self.process = mp.Process( target=worker
+                             , args=(child_connection, filename, load_code(filename))
+                             , daemon=True )
+    self.process.start()
+    child_connection.close()
+    self.is_dummy = self.receive()
+
+  def receive(self):
+    try:
+      return self.connection.recv()
+    except (EOFError, OSError):
+      self.alive = False
+      return True
+
+  def request(self, index, snapshot_data):
+    # returns whether the ai got a new request
+    if not self.alive:
+      return False
+    if self.pending is not None:
+      self.collect(time.monotonic())
+      if self.pending is not None:
+        return False
+    self.request_id += 1
+    try:
+      self.connection.send((self.request_id, index, snapshot_data))
+    except (BrokenPipeError, OSError):
+      self.alive = False
+      return False
+    self.pending = self.request_id
+    return True
+
+  def collect(self, deadline):
+    # returns the orders for the pending request, or None if there are
+    # none by the deadline
+    while self.alive and self.pending is not None:
+      if not self.connection.poll(max(0, deadline - time.monotonic())):
+        return None
+      reply = self.receive()
+      if not self.alive:
+        return None
+      request_id, orders, think_time = reply
+      if request_id == self.pending:
+        self.pending = None
+        self.think_time = think_time
+        return orders
+      # else: a late answer to an earlier request, throw it away
+    return None
+
+  def close(self):
+    if self.alive:
+      try:
+        self.connection.send(None)
+      except (BrokenPipeError, OSError):
+        pass
+    self.process.join(0.1)
+    if self.process.is_alive():
+      self.process.terminate()
+      self.process.join()
+    self.connection.close()
+    self.alive = False
+
+
+def worker(connection, filename, code):
+  ai = compile_ai(filename, code)
+  connection.send(ai.is_dummy)
+  while True:
+    try:
+      request = connection.recv()
+    except EOFError:
+      return
+    if request is None:
+      return
+    request_id, index, snapshot_data = request
+    start = time.perf_counter()
+    snapshot = pickle.loads(snapshot_data)
+    orders = decide(ai, snapshot, index)
+    connection.send((request_id, orders, time.perf_counter() - start))
+
+def decide(ai, snapshot, index):
+  # runs the ai and returns a list of (target x, target y, magnet strength)
+  # for all of its seekers
+  player = snapshot.players[index]
+  def warn_invalid_data():
+    print( "The AI of Player "
+         + player.name
+         + " returned invalid data" )
+  own_seekers, other_seekers, all_seekers, goals, other_players, own_camp, camps, world = \
+    snapshot.ai_input(index)
+  originals = [mutable_copy(s) for s in player.seekers]
+  try:
+    new_seekers = ai( own_seekers
+                    , other_seekers
+                    , all_seekers
+                    , goals
+                    , other_players
+                    , own_camp
+                    , camps
+                    , world )
+  except Exception:
+    print(  "The AI of Player "
+            + player.name
+            + " raised an exception:" )
+    traceback.print_exc(file=sys.stderr)
+    new_seekers = []
+  if isinstance(new_seekers, list):
+    for new, original in zip(new_seekers, originals):
+      if isinstance(new, Seeker):
+        status = Seeker.copy_alterables(new,original)
+        if not status: warn_invalid_data()
+      else: warn_invalid_data()
+  else: warn_invalid_data()
+  return [(s.target.x, s.target.y, s.magnet.strength) for s in originals]
+
+def dummy_decide(mySeekers, other_seekers, all_seekers, goals, otherPlayers, own_camp, camps, world):
+  for s in mySeekers:
+    s.target = s.position
+  return mySeekers
+
+def mogrify(code):
+  def indent(lines):
+    return utils.fmap(lambda l: " "+l,lines)
+
+  if code.startswith("#bot"):
+    prelude = []
+    lines = code.split("\n")
+    seekerdef = ["def decide(seekers, other_seekers, all_seekers, goals, otherPlayers, own_camp, camps, world):"]
+    seekerret = ["return seekers"]
+    lines = seekerdef + indent(prelude + lines[1:] + seekerret)
+    return "\n".join(lines)
+  else:
+    return code
+
+def print_error():
+  print("**********************************************************", file=sys.stderr)
+  traceback.print_exc(file=sys.stderr)
+  print("", file=sys.stderr)
+
+def load_code(filename):
+  # the marshalled code of an ai file, or None if it cannot be compiled
+  try:
+    with open(filename, "r") as f:
+      return cached_code(mogrify(f.read()))
+  except Exception:
+    print_error()
+    return None
+
+def compile_ai(filename, code=None):
+  # the decide function of an ai, or dummy_decide if it is broken
+  if code is None:
+    code = load_code(filename)
+  try:
+    if code is None:
+      raise ImportError("could not compile " + filename)
+    spec = importlib.util.spec_from_loader(filename[:-3], loader=None)
+    mod = importlib.util.module_from_spec(spec)
+    exec(marshal.loads(code), mod.__dict__)
+    ai = mod.decide
+    ai.is_dummy = False
+  except Exception:
+    if code is not None:
+      print_error()
+    ai = dummy_decide
+    ai.is_dummy = True
+
+  return ai
+
+
+# Compiled ais by the sha256 hash of their (mogrified) source, so that an
+# unchanged ai is parsed and compiled only once: in memory, the
+# max_cached_code most recently used ones, and on disk (in cache_directory)
+# the max_cached_files most recently used ones, for all processes.
+
+code_cache = collections.OrderedDict()
+max_cached_code = 64
+cache_directory = os.path.join(os.path.expanduser("~"), ".cache", "seekers")
+max_cached_files = 1000
+
+def cached_code(source):
+  key = hashlib.sha256(source.encode()).hexdigest()
+  code = code_cache.get(key)
+  if code is not None:
+    code_cache.move_to_end(key)
+    return code
+  code = read_cached_file(key)
+  if code is None:
+    # "<string>" as before, when the source itself was exec'ed
+    code = marshal.dumps(compile(source, "<string>", "exec"))
+    write_cached_file(key, code)
+  code_cache[key] = code
+  if len(code_cache) > max_cached_code:
+    code_cache.popitem(last=False)
+  return code
+
+def cached_file(key):
+  return os.path.join(cache_directory, key + ".code")
+
+def read_cached_file(key):
+  # the file starts with the magic number of the python version that wrote it
+  magic = importlib.util.MAGIC_NUMBER
+  try:
+    with open(cached_file(key), "rb") as f:
+      data = f.read()
+    os.utime(cached_file(key))
+  except OSError:
+    return None
+  if not data.startswith(magic):
+    return None
+  return data[len(magic):]
+
+def write_cached_file(key, code):
+  # the cache is only an optimization, so failures are ignored
+  try:
+    os.makedirs(cache_directory, exist_ok=True)
+    temporary = cached_file(key) + "." + str(os.getpid())
+    with open(temporary, "wb") as f:
+      f.write(importlib.util.MAGIC_NUMBER + code)
+    os.replace(temporary, cached_file(key))
+    files = [os.path.join(cache_directory, f) for f in os.listdir(cache_directory)]
+    if len(files) > max_cached_files:
+      files.sort(key=os.path.getmtime)
+      for f in files[:len(files) - max_cached_files]:
+        os.remove(f)
+  except OSError:
+    pass
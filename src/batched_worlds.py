@@ -0,0 +1,232 @@
+from seekers_types import *
+import engine
+from numpy_physics import normalize_positions, torus_distance, torus_difference, normalized, bump
+
+import random
+
+import numpy as np
+
+
+# Many independent matches ("worlds") at once, for evaluating bots over
+# many seeds. All worlds have the same size, players, seekers and goals;
+# their state is kept in arrays with the world as first axis, and
+# BatchedWorlds.step advances all of them by one tick with the rules of
+# game_logic.tick.
+#
+# Every world has its own random generator, seeded with its seed and used
+# in the same order as engine.setup_match and game_logic.score_goals use
+# the random module, so world i starts (and respawns goals) exactly like
+# a match with seeds[i].
+#
+# There are no ais: between steps, the caller sets the orders of all
+# seekers in targets (worlds, seekers, 2) and magnets (worlds, seekers).
+# Seekers are numbered player by player, so the seekers of player i are
+# i*num_seekers to (i+1)*num_seekers - 1.
+# checks.py compares trajectories with game_logic and their speed.
+
+class BatchedWorlds:
+  def __init__( self, seeds, num_players, num_seekers=engine.num_seekers
+              , num_goals=engine.num_goals, width=768, height=768 ):
+    self.world = World(width, height)
+    self.num_worlds = len(seeds)
+    self.num_players = num_players
+    self.num_seekers = num_seekers
+    self.num_goals = num_goals
+    self.rngs = [random.Random(seed) for seed in seeds]
+    n = num_players * num_seekers
+    goals = []
+    seekers = []
+    for rng in self.rngs:
+      goals.append([random_position(rng, self.world) for _ in range(num_goals)])
+      seekers.append([random_position(rng, self.world) for _ in range(n)])
+    # seekers and goals in one array each, the seeker_ and goal_ arrays
+    # are views of their parts
+    shape = (self.num_worlds, n + num_goals, 2)
+    self.positions = np.zeros(shape)
+    self.velocities = np.zeros(shape)
+    self.accelerations = np.zeros(shape)
+    self.seeker_positions = self.positions[:,:n]
+    self.seeker_velocities = self.velocities[:,:n]
+    self.seeker_accelerations = self.accelerations[:,:n]
+    self.goal_positions = self.positions[:,n:]
+    self.goal_velocities = self.velocities[:,n:]
+    self.goal_accelerations = self.accelerations[:,n:]
+    self.seeker_positions[:] = np.array(seekers, dtype=float).reshape(-1, n, 2)
+    self.goal_positions[:] = np.array(goals, dtype=float).reshape(-1, num_goals, 2)
+    self.disabled_counters = np.zeros((self.num_worlds, n), dtype=int)
+    self.targets = self.seeker_positions.copy()
+    self.magnets = np.zeros((self.num_worlds, n))
+    self.owners = np.full((self.num_worlds, num_goals), -1)
+    self.owned_for = np.zeros((self.num_worlds, num_goals), dtype=int)
+    self.scores = np.zeros((self.num_worlds, num_players), dtype=int)
+    camps = self.world.generate_camps(range(num_players))
+    self.camp_positions = np.array([tuple(c.position) for c in camps]).reshape(-1, 2)
+    self.camp_sizes = np.array([(c.width, c.height) for c in camps]).reshape(-1, 2)
+    self.radii = np.array([Seeker.radius]*n + [Goal.radius]*num_goals)
+    self.masses = np.array([Seeker.mass]*n + [Goal.mass]*num_goals)
+    # all pairs (first[k], second[k]) of seekers and goals with
+    # first < second, in the order game_logic.handle_collisions tests them,
+    # and the distance below which they collide
+    self.first, self.second = np.triu_indices(n + num_goals, k=1)
+    self.min_distances = self.radii[self.first] + self.radii[self.second]
+    self.size = np.array([width, height], dtype=float)
+    self.ticks = 0
+
+  def step(self):
+    self.move_seekers()
+    self.move_goals()
+    self.handle_collisions()
+    self.score_goals()
+    self.ticks += 1
+
+  def winners(self):
+    # the winning player of every world, the first one of equals as in
+    # engine.winner
+    return self.scores.argmax(axis=1)
+
+  def move_seekers(self):
+    world = self.world
+    p = self.seeker_positions
+    v = self.seeker_velocities
+    a = self.seeker_accelerations
+    v *= 1 - Seeker.friction
+    active = self.disabled_counters == 0
+    a[:] = np.where(active[...,None], normalized(torus_difference(world, p, self.targets)), 0)
+    thrust = Seeker.base_thrust * np.where(self.magnets != 0, Seeker.magnet_slowdown, 1)
+    v += a * thrust[...,None]
+    p += v
+    normalize_positions(world, p)
+    self.disabled_counters -= self.disabled_counters > 0
+
+  def move_goals(self):
+    world = self.world
+    # all seeker-goal pairs, seekers along the second axis, as
+    # torus_distance; magnets only reach a tenth of the diameter, so only
+    # the pairs within that are looked at afterwards
+    delta = np.abs(self.goal_positions[:,None,:,:] - self.seeker_positions[:,:,None,:])
+    wrapped = np.minimum(delta, self.size - delta)
+    r = np.sqrt(wrapped[...,0]*wrapped[...,0] + wrapped[...,1]*wrapped[...,1]) / world.diameter()
+    strength = np.where(self.disabled_counters > 0, 0, self.magnets)
+    w, s, g = np.nonzero((r*10 < 1) & (strength != 0)[...,None])
+    left = self.seeker_positions[w,s]
+    right = self.goal_positions[w,g]
+    d = normalized(torus_difference(world, left, right))
+    forces = -d * (strength[w,s] * bump(r[w,s,g]*10))[:,None]
+    # added up in seeker order (np.add.at adds one after the other), like
+    # game_logic.magnetic_forces
+    a = self.goal_accelerations
+    a[:] = 0
+    np.add.at(a, (w, g), forces)
+    v = self.goal_velocities
+    p = self.goal_positions
+    v *= 1 - Goal.friction
+    v += a * Goal.base_thrust
+    p += v
+    normalize_positions(world, p)
+
+  def handle_collisions(self):
+    # The pairs (i, j), i < j, of a world are tested one after the other,
+    # in order, each with the positions it has by then, as in
+    # game_logic.handle_collisions. Nothing moves between two collisions,
+    # so a world's next collision is its first colliding pair after the
+    # last one, with the current positions. The worlds are independent:
+    # the next collisions of all worlds are looked up and handled at once,
+    # and afterwards only the worlds that had one are looked at again.
+    n = self.seeker_positions.shape[1]
+    p = self.positions
+    v = self.velocities
+    worlds = np.arange(self.num_worlds)
+    # the index of every world's last collision in the pairs
+    last = np.full(self.num_worlds, -1)
+    pairs = np.arange(len(self.first))
+    while len(worlds):
+      hits = self.colliding(worlds)
+      hits &= pairs[None,:] > last[:,None]
+      found = hits.any(axis=1)
+      worlds = worlds[found]
+      last = hits[found].argmax(axis=1)
+      self.collide(p, v, n, worlds, self.first[last], self.second[last], self.min_distances[last])
+
+  def colliding(self, worlds):
+    # which pairs of the worlds collide, shape (worlds, pairs), with the
+    # distance of game_logic.collide (World.torus_distance)
+    squares = []
+    for axis in range(2):
+      x = self.positions[worlds,:,axis]
+      d = np.abs(x[:,self.first] - x[:,self.second])
+      np.minimum(d, self.size[axis] - d, out=d)
+      squares.append(d*d)
+    return np.sqrt(squares[0] + squares[1]) < self.min_distances
+
+  def collide(self, p, v, n, w, i, j, min_dist):
+    # the colliding pair (i, j) of every world w
+    world = self.world
+
+    # colliding seekers are disabled, see Seeker.collision
+    seekers = j < n
+    ws, si, sj = w[seekers], i[seekers], j[seekers]
+    on_i = self.magnets[ws,si] != 0
+    on_j = self.magnets[ws,sj] != 0
+    counters = self.disabled_counters
+    counters[ws,si] = np.where(on_i | ~on_j, Seeker.disabled_time, counters[ws,si])
+    counters[ws,sj] = np.where(on_j | ~on_i, Seeker.disabled_time, counters[ws,sj])
+
+    # elastic collision, see Physical.collision
+    s = p[w,i]
+    t = p[w,j]
+    d = torus_difference(world, s, t)
+    norm = np.sqrt(d[:,0]*d[:,0] + d[:,1]*d[:,1])
+    moving = norm != 0
+    dn = d / np.where(moving, norm, 1)[:,None]
+    sv = v[w,i]
+    tv = v[w,j]
+    dvdn = (tv[:,0] - sv[:,0]) * dn[:,0] + (tv[:,1] - sv[:,1]) * dn[:,1]
+    ms = self.masses[i]
+    mt = self.masses[j]
+    m = 2 / (ms + mt)
+    bounce = (moving & (dvdn < 0))[:,None]
+    v[w,i] = np.where(bounce, sv + dn * (m * mt * dvdn)[:,None], sv)
+    v[w,j] = np.where(bounce, tv + dn * (-(m * ms * dvdn))[:,None], tv)
+    ddn = d[:,0]*dn[:,0] + d[:,1]*dn[:,1]
+    push = (moving & (ddn < min_dist))[:,None]
+    p[w,i] = np.where(push, s + dn * (ddn - min_dist)[:,None], s)
+    p[w,j] = np.where(push, t + dn * (-(ddn - min_dist))[:,None], t)
+
+  def score_goals(self):
+    # as Goal.camp_tick, for the camp containing a goal (camps don't overlap)
+    delta = self.camp_positions[None,None] - self.goal_positions[:,:,None]
+    sizes = self.camp_sizes[None,None]
+    inside = ( (2 * np.abs(delta[...,0]) < sizes[...,0])
+             & (2 * np.abs(delta[...,1]) < sizes[...,1]) )
+    in_camp = inside.any(axis=2)
+    camp = inside.argmax(axis=2)
+    same = self.owners == camp
+    self.owned_for[:] = np.where(in_camp, np.where(same, self.owned_for + 1, 0), self.owned_for)
+    self.owners[:] = np.where(in_camp, camp, self.owners)
+    scored = in_camp & (self.owned_for >= Goal.scoring_time)
+    # rare, so one by one, in the order of game_logic.score_goals
+    for w, g in zip(*np.nonzero(scored)):
+      self.scores[w, self.owners[w,g]] += 1
+      self.goal_positions[w,g] = random_position(self.rngs[w], self.world)
+      self.goal_velocities[w,g] = 0
+      self.goal_accelerations[w,g] = 0
+      self.owners[w,g] = -1
+      self.owned_for[w,g] = 0
+
+def random_position(rng, world):
+  # as World.random_position
+  return (rng.uniform(0, world.width), rng.uniform(0, world.height))
+
+
+# An example bot for all worlds at once: every seeker fetches a goal with
+# its magnet on, and then brings it home.
+def fetch_goals(worlds):
+  b, n, _ = worlds.seeker_positions.shape
+  seeker = np.arange(n)
+  player = seeker // worlds.num_seekers
+  goal = seeker % worlds.num_goals
+  fetching = (worlds.ticks // 400 + seeker) % 2 == 0
+  worlds.targets[:] = np.where( fetching[None,:,None]
+                              , worlds.goal_positions[:,goal]
+                              , worlds.camp_positions[None,player] )
+  worlds.magnets[:] = 1
@@ -0,0 +1,173 @@
+from seekers_types import *
+import game_logic
+import events
+import utils
+
+import sys
+import json
+import pickle
+import time
+import random
+import argparse
+import itertools
+import platform
+
+
+# Benchmarks for the simulation core.
+#
+#   python3 src/benchmark.py run [--output FILE] [--ticks N] [--numpy]
+#   python3 src/benchmark.py compare OLD.json NEW.json [--threshold 0.1]
+#
+# "run" times game_logic.tick (without ais, the seekers get random orders
+# from a seeded generator) for every combination of player count,
+# num_seekers and num_goals, and separately prepare_ai_input (building,
+# pickling and unpickling the Snapshot, and every player's ai_input),
+# Vector arithmetic and World.torus_distance. "compare" flags every
+# benchmark that got slower by more than the threshold, and exits with
+# status 1 if there is any.
+
+player_counts = [2, 4, 8]
+seeker_counts = [5, 10]
+goal_counts = [6, 20]
+
+def setup(num_players, num_seekers, num_goals, seed):
+  random.seed(seed)
+  world = World(768, 768)
+  players = [Player("player " + str(i)) for i in range(num_players)]
+  for p in players:
+    p.seekers = [Seeker(i, world.random_position()) for i in range(num_seekers)]
+  goals = [Goal(world.random_position()) for _ in range(num_goals)]
+  return world, players, world.generate_camps(players), goals
+
+def give_orders(rng, world, players):
+  for p in players:
+    for s in p.seekers:
+      s.target = Vector(rng.uniform(0, world.width), rng.uniform(0, world.height))
+      s.magnet.strength = rng.choice([0, 0, 1, -8])
+
+def statistics(durations):
+  # durations in seconds, per tick or per call
+  p50, p90, p99 = utils.percentiles(durations, (0.5, 0.9, 0.99))
+  return { "per_second": len(durations) / sum(durations)
+         , "p50_us": p50 * 1e6
+         , "p90_us": p90 * 1e6
+         , "p99_us": p99 * 1e6 }
+
+def bench_tick(physics, num_players, num_seekers, num_goals, ticks, seed=42):
+  world, players, camps, goals = setup(num_players, num_seekers, num_goals, seed)
+  # nobody drains the events, the ring buffer just overwrites them
+  stream = events.EventStream()
+  rng = random.Random(seed)
+  durations = []
+  for t in range(ticks):
+    if t % 50 == 0:
+      give_orders(rng, world, players)
+    start = time.perf_counter()
+    physics.tick(players, camps, goals, stream, world)
+    durations.append(time.perf_counter() - start)
+  return statistics(durations)
+
+def bench_prepare_ai_input(num_players, num_seekers, num_goals, repetitions, seed=42):
+  world, players, camps, goals = setup(num_players, num_seekers, num_goals, seed)
+  durations = []
+  for _ in range(repetitions):
+    start = time.perf_counter()
+    # what engine.call_ais and the ai workers do to prepare the ais' input
+    data = pickle.dumps(Snapshot(players, goals, camps, world))
+    for i in range(len(players)):
+      pickle.loads(data).ai_input(i)
+    durations.append(time.perf_counter() - start)
+  return statistics(durations)
+
+def bench_calls(f, repetitions, batch=100):
+  # times batches of calls, and reports per call
+  durations = []
+  for _ in range(repetitions):
+    start = time.perf_counter()
+    for _ in range(batch):
+      f()
+    durations.append((time.perf_counter() - start) / batch)
+  return statistics(durations)
+
+def bench_vector(repetitions):
+  v = Vector(3, 4)
+  w = Vector(-1, 2)
+  return bench_calls(lambda: ((v + w) * 2 - w).normalized().norm(), repetitions)
+
+def bench_torus_distance(repetitions, seed=42):
+  rng = random.Random(seed)
+  world = World(768, 768)
+  a = Vector(rng.uniform(0, 768), rng.uniform(0, 768))
+  b = Vector(rng.uniform(0, 768), rng.uniform(0, 768))
+  return bench_calls(lambda: world.torus_distance(a, b), repetitions)
+
+def run(ticks, physics_name="python"):
+  if physics_name == "numpy":
+    import numpy_physics
+  results = {}
+  for num_players, num_seekers, num_goals in itertools.product(player_counts, seeker_counts, goal_counts):
+    physics = numpy_physics.ArrayPhysics() if physics_name == "numpy" else game_logic
+    name = "tick/players=%d/seekers=%d/goals=%d" % (num_players, num_seekers, num_goals)
+    results[name] = bench_tick(physics, num_players, num_seekers, num_goals, ticks)
+    name = "prepare_ai_input/players=%d/seekers=%d/goals=%d" % (num_players, num_seekers, num_goals)
+    results[name] = bench_prepare_ai_input(num_players, num_seekers, num_goals, ticks // 2)
+  results["vector"] = bench_vector(ticks)
+  results["torus_distance"] = bench_torus_distance(ticks)
+  return { "python": platform.python_version()
+         , "physics": physics_name
+         , "ticks": ticks
+         , "time": time.strftime("%Y-%m-%d %H:%M:%S")
+         , "results": results }
+
+def compare(old, new, threshold):
+  # returns the names of all benchmarks that got slower by more than threshold
+  regressions = []
+  for name, result in sorted(new["results"].items()):
+    if name not in old["results"]:
+      continue
+    before = old["results"][name]["per_second"]
+    after = result["per_second"]
+    change = after / before - 1
+    flag = ""
+    if change < -threshold:
+      regressions.append(name)
+      flag = "  REGRESSION"
+    print("%-50s %12.0f/s -> %12.0f/s  %+6.1f%%%s" % (name, before, after, 100*change, flag))
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description="benchmarks for the simulation core")
+  commands = parser.add_subparsers(dest="command", required=True)
+  run_parser = commands.add_parser("run", help="run the benchmarks")
+  run_parser.add_argument("--output", help="json result file (default: stdout)")
+  run_parser.add_argument("--ticks", type=int, default=500)
+  run_parser.add_argument("--numpy", action="store_true",
+      help="benchmark the numpy physics backend")
+  compare_parser = commands.add_parser("compare", help="compare two runs")
+  compare_parser.add_argument("old")
+  compare_parser.add_argument("new")
+  compare_parser.add_argument("--threshold", type=float, default=0.1,
+      help="relative slowdown that counts as regression (default: %(default)s)")
+  args = parser.parse_args()
+
+  if args.command == "run":
+    results = run(args.ticks, "numpy" if args.numpy else "python")
+    if args.output:
+      with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    else:
+      json.dump(results, sys.stdout, indent=2)
+      print()
+  else:
+    with open(args.old) as f:
+      old = json.load(f)
+    with open(args.new) as f:
+      new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+      print(str(len(regressions)) + " regression(s)")
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
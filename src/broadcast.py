@@ -0,0 +1,194 @@
+from seekers_types import *
+import replay
+
+import os
+import json
+import zlib
+import time
+import socket
+import struct
+
+
+# Streams a running match to spectators over a TCP or unix socket.
+#
+# A spectator first gets the same header as a replay file, then one message
+# per published frame: kind, tick and the length of the zlib compressed
+# payload. The payload is a replay frame (see replay.frame_values), either
+# complete (a key frame) or xored with the previous frame sent to the
+# spectator (a delta; everything that did not change, like scores, magnets
+# and goals nobody touched, is zero and compresses well).
+#
+# Sockets are non-blocking and everything happens in publish(), so
+# spectators can never stall the game. A spectator whose unsent data grows
+# beyond max_pending skips frames (and gets a key frame once it caught up),
+# and one that accepts no data for drop_after seconds is disconnected.
+
+key_frame = 0
+delta_frame = 1
+message_header = struct.Struct("<BiI")
+
+def parse_address(address):
+  # "host:port" or "port" for tcp, anything else is a unix socket path
+  host, _, port = address.rpartition(":")
+  if port.isdigit():
+    return socket.AF_INET, (host or "localhost", int(port))
+  return socket.AF_UNIX, address
+
+def xor(a, b):
+  return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+class Broadcaster:
+  def __init__(self, address, players, goals, world, seed, max_pending=1 << 18, drop_after=5.0):
+    self.max_pending = max_pending
+    self.drop_after = drop_after
+    self.header = replay.header_data(players, goals, world, seed)
+    self.format = replay.frame_format( [len(p.seekers) for p in players]
+                                     , len(goals), len(players) )
+    self.spectators = []
+    self.previous = None
+    family, self.address = parse_address(address)
+    if family == socket.AF_UNIX and os.path.exists(self.address):
+      os.unlink(self.address)
+    self.server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET:
+      self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self.server.bind(self.address)
+    self.server.listen()
+    self.server.setblocking(False)
+
+  def publish(self, tick, players, goals):
+    self.accept()
+    if not self.spectators:
+      self.previous = None
+      return
+    frame = self.format.pack(*replay.frame_values(players, goals))
+    # both are the same for all spectators, and only made when needed
+    key = None
+    delta = None
+    now = time.monotonic()
+    for s in list(self.spectators):
+      if len(s.pending) > self.max_pending:
+        s.synced = False
+      elif not s.synced:
+        if key is None:
+          key = message(key_frame, tick, frame)
+        s.pending += key
+        s.synced = True
+      else:
+        # synced spectators got the previous frame
+        if delta is None:
+          delta = message(delta_frame, tick, xor(frame, self.previous))
+        s.pending += delta
+      self.send(s, now)
+    self.previous = frame
+
+  def accept(self):
+    while True:
+      try:
+        connection, _ = self.server.accept()
+      except (BlockingIOError, InterruptedError):
+        return
+      connection.setblocking(False)
+      s = Spectator(connection)
+      s.pending += self.header
+      self.spectators.append(s)
+
+  def send(self, s, now):
+    try:
+      while s.pending:
+        sent = s.connection.send(s.pending)
+        del s.pending[:sent]
+        s.last_progress = now
+    except (BlockingIOError, InterruptedError):
+      if now - s.last_progress > self.drop_after:
+        self.drop(s)
+    except OSError:
+      self.drop(s)
+
+  def drop(self, s):
+    s.connection.close()
+    self.spectators.remove(s)
+
+  def close(self):
+    for s in list(self.spectators):
+      self.drop(s)
+    self.server.close()
+    if self.server.family == socket.AF_UNIX:
+      try:
+        os.unlink(self.address)
+      except OSError:
+        pass
+
+class Spectator:
+  def __init__(self, connection):
+    self.connection = connection
+    self.pending = bytearray()
+    # whether it got the previous frame, so that it can get a delta
+    self.synced = False
+    self.last_progress = time.monotonic()
+
+def message(kind, tick, frame):
+  payload = zlib.compress(frame, 1)
+  return message_header.pack(kind, tick, len(payload)) + payload
+
+
+class Stream:
+  # the spectators' end: reads the header, then frames as they arrive
+  def __init__(self, address):
+    family, address = parse_address(address)
+    self.connection = socket.socket(family, socket.SOCK_STREAM)
+    self.connection.connect(address)
+    self.buffer = bytearray()
+    start = len(replay.magic) + replay.length_format.size
+    self.receive(start)
+    if self.buffer[:len(replay.magic)] != replay.magic:
+      raise ValueError("not a seekers match stream")
+    (length,) = replay.length_format.unpack_from(self.buffer, len(replay.magic))
+    self.receive(start + length)
+    self.header = json.loads(self.buffer[start:start+length].decode())
+    del self.buffer[:start+length]
+    self.num_seekers = [p["num_seekers"] for p in self.header["players"]]
+    self.num_goals = self.header["num_goals"]
+    self.format = replay.frame_format( self.num_seekers, self.num_goals
+                                     , len(self.num_seekers) )
+    self.frame = None
+    self.tick = 0
+    self.connection.setblocking(False)
+
+  def receive(self, size):
+    # blocks until the buffer holds size bytes
+    while len(self.buffer) < size:
+      data = self.connection.recv(65536)
+      if not data:
+        raise EOFError("the match stream ended")
+      self.buffer += data
+
+  def update(self):
+    # reads everything that arrived; returns the list of (tick, frame
+    # values) received, the last of which is the current state
+    try:
+      while True:
+        data = self.connection.recv(65536)
+        if not data:
+          raise EOFError("the match stream ended")
+        self.buffer += data
+    except (BlockingIOError, InterruptedError):
+      pass
+    frames = []
+    while len(self.buffer) >= message_header.size:
+      kind, tick, length = message_header.unpack_from(self.buffer)
+      end = message_header.size + length
+      if len(self.buffer) < end:
+        break
+      frame = zlib.decompress(self.buffer[message_header.size:end])
+      del self.buffer[:end]
+      if kind == delta_frame:
+        frame = xor(frame, self.frame)
+      self.frame = frame
+      self.tick = tick
+      frames.append((tick, self.format.unpack(frame)))
+    return frames
+
+  def close(self):
+    self.connection.close()
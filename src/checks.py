@@ -0,0 +1,492 @@
+from seekers_types import *
+import game_logic
+import lookahead
+
+import sys
+import copy
+import time
+import random
+import argparse
+
+
+# Checks that the faster or alternative formulations of the game compute
+# the same as the plain one, and how fast they are:
+#
+#   collisions    game_logic.handle_collisions (with its grid) against
+#                 testing every pair
+#   numpy         numpy_physics.ArrayPhysics against game_logic.tick
+#   batched       batched_worlds.BatchedWorlds against game_logic.tick
+#   environment   environment.Environment against engine.setup_match, and
+#                 the same episodes after resets
+#   lookahead     lookahead.simulate against the game
+#   vectors       game_logic.tick against the old engine, whose collisions
+#                 gave physicals new position and velocity vectors
+#
+#   python3 src/checks.py [CHECK...]
+#
+# runs the named checks (all without arguments), prints what they found
+# and exits with 1 if any of them failed. The numpy checks need numpy.
+
+
+# collisions
+
+# The collision pass without the grid, every pair in order.
+def handle_collisions_pairwise(physicals, world):
+  for i in range(len(physicals)):
+    for j in range(i+1, len(physicals)):
+      game_logic.collide(physicals[i], physicals[j], world, None)
+
+# Dense setups, in which collisions push physicals into further ones: a
+# world of random size with overlapping clusters of seekers and goals.
+cluster_world_sizes = [40, 60, 100, 130, 200, 768]
+
+def cluster_setup(rng):
+  world = World(rng.choice(cluster_world_sizes), rng.choice(cluster_world_sizes))
+  physicals = []
+  for _ in range(rng.randint(2, 6)):
+    center = Vector(rng.uniform(0, world.width), rng.uniform(0, world.height))
+    for _ in range(rng.randint(2, 12)):
+      pos = cluster_position(rng, world, center)
+      if rng.random() < 0.6:
+        p = Seeker(len(physicals), pos)
+        p.magnet.strength = rng.choice([0, 1])
+      else:
+        p = Goal(pos)
+      p.velocity = Vector(rng.uniform(-5, 5), rng.uniform(-5, 5))
+      physicals.append(p)
+  return world, physicals
+
+def cluster_position(rng, world, center):
+  pos = Vector(center.x + rng.gauss(0, 8), center.y + rng.gauss(0, 8))
+  world.normalize_position(pos)
+  return pos
+
+def physical_state(physicals):
+  return [ (tuple(p.position), tuple(p.velocity), getattr(p, "disabled_counter", 0))
+           for p in physicals ]
+
+def collision_parity_check(setups=3000, seed=0):
+  # the number of cluster setups in which both passes differ
+  rng = random.Random(seed)
+  different = 0
+  for _ in range(setups):
+    world, physicals = cluster_setup(rng)
+    expected = copy.deepcopy(physicals)
+    handle_collisions_pairwise(expected, world)
+    game_logic.handle_collisions(physicals, world)
+    if physical_state(expected) != physical_state(physicals):
+      different += 1
+  return different
+
+def check_collisions():
+  different = collision_parity_check()
+  print("setups where the grid differs from all pairs: " + str(different))
+  return different == 0
+
+
+# numpy
+
+def numpy_parity_check(ticks=2000, num_players=3, seed=42):
+  # compare trajectories of both engines, with the same random orders
+  import numpy as np
+  import numpy_physics
+  import events as ev
+
+  def setup():
+    random.seed(seed)
+    world = World(768, 768)
+    players = [Player("player " + str(i)) for i in range(num_players)]
+    for p in players:
+      p.seekers = [Seeker(i, world.random_position()) for i in range(5)]
+    goals = [Goal(world.random_position()) for _ in range(6)]
+    return world, players, world.generate_camps(players), goals
+
+  def give_orders(rng, world, players):
+    for p in players:
+      for s in p.seekers:
+        s.target = Vector(rng.uniform(0, world.width), rng.uniform(0, world.height))
+        s.magnet.strength = rng.choice([0, 0, 1, -8])
+
+  def run(physics):
+    world, players, camps, goals = setup()
+    events = ev.EventStream()
+    rng = random.Random(seed)
+    trajectory = []
+    for t in range(ticks):
+      if t % 50 == 0:
+        give_orders(rng, world, players)
+      physics.tick(players, camps, goals, events, world)
+      trajectory.append([tuple(s.position) for p in players for s in p.seekers]
+                        + [tuple(g.position) for g in goals])
+    return np.array(trajectory), [p.score for p in players]
+
+  expected, expected_scores = run(game_logic)
+  actual, actual_scores = run(numpy_physics.ArrayPhysics())
+  return np.abs(expected - actual).max(), expected_scores == actual_scores
+
+def numpy_cluster_check(setups=3000, ticks=3, seed=0):
+  # the number of cluster setups in which the seekers and goals of both
+  # engines differ (by more than the last bits of numpy's exp) after ticks
+  import numpy as np
+  import numpy_physics
+  rng = random.Random(seed)
+  physics = numpy_physics.ArrayPhysics()
+  different = 0
+  for _ in range(setups):
+    world, physicals = cluster_setup(rng)
+    player = Player("player")
+    player.seekers = [p for p in physicals if isinstance(p, Seeker)]
+    for s in player.seekers:
+      s.target = Vector(rng.uniform(0, world.width), rng.uniform(0, world.height))
+    goals = [p for p in physicals if isinstance(p, Goal)]
+    expected_player, expected_goals = copy.deepcopy((player, goals))
+    for _ in range(ticks):
+      game_logic.tick([expected_player], [], expected_goals, None, world)
+      physics.tick([player], [], goals, None, world)
+    expected = physical_state(expected_player.seekers + expected_goals)
+    actual = physical_state(player.seekers + goals)
+    if ( [c for _,_,c in expected] != [c for _,_,c in actual]
+         or np.abs(np.array([p + v for p,v,_ in expected]) - np.array([p + v for p,v,_ in actual])).max() > 1e-6 ):
+      different += 1
+  return different
+
+def check_numpy(ticks=2000):
+  error, same_scores = numpy_parity_check(ticks)
+  print("maximal position difference after " + str(ticks) + " ticks: " + str(error))
+  print("same scores: " + str(same_scores))
+  different = numpy_cluster_check()
+  print("cluster setups where the engines differ: " + str(different))
+  return error < 1e-6 and same_scores and different == 0
+
+
+# batched
+
+# The same matches with game_logic, one after the other: the worlds'
+# arrays are only used to give the orders.
+def object_trajectories(seeds, num_players, ticks, decide):
+  import numpy as np
+  import batched_worlds
+  trajectories = []
+  scores = []
+  for seed in seeds:
+    worlds = batched_worlds.BatchedWorlds([seed], num_players)
+    world = worlds.world
+    random.seed(seed)
+    goals = [Goal(world.random_position()) for _ in range(worlds.num_goals)]
+    players = [Player("player " + str(i)) for i in range(num_players)]
+    for p in players:
+      p.seekers = [Seeker(i, world.random_position()) for i in range(worlds.num_seekers)]
+    camps = world.generate_camps(players)
+    seekers = [s for p in players for s in p.seekers]
+    trajectory = []
+    for t in range(ticks):
+      worlds.seeker_positions[0] = [tuple(s.position) for s in seekers]
+      worlds.goal_positions[0] = [tuple(g.position) for g in goals]
+      worlds.ticks = t
+      decide(worlds)
+      for s, target, strength in zip(seekers, worlds.targets[0].tolist(), worlds.magnets[0].tolist()):
+        s.target = Vector(*target)
+        s.magnet.strength = strength
+      game_logic.tick(players, camps, goals, None, world)
+      trajectory.append([tuple(s.position) for s in seekers] + [tuple(g.position) for g in goals])
+    trajectories.append(trajectory)
+    scores.append([p.score for p in players])
+  return np.array(trajectories).transpose(1, 0, 2, 3), np.array(scores)
+
+def batched_trajectories(seeds, num_players, ticks, decide):
+  import numpy as np
+  import batched_worlds
+  worlds = batched_worlds.BatchedWorlds(seeds, num_players)
+  trajectory = []
+  for _ in range(ticks):
+    decide(worlds)
+    worlds.step()
+    trajectory.append(np.concatenate((worlds.seeker_positions, worlds.goal_positions), axis=1))
+  return np.array(trajectory), worlds.scores
+
+# numpy's exp and math's exp (used by bump) differ in the last bit now and
+# then, and the matches are chaotic enough to blow that up to visible
+# differences after a couple of thousand ticks, so the check stops earlier.
+def batched_parity_check(ticks=1000, num_worlds=8, num_players=2):
+  import numpy as np
+  import batched_worlds
+  seeds = list(range(num_worlds))
+  decide = batched_worlds.fetch_goals
+  expected, expected_scores = object_trajectories(seeds, num_players, ticks, decide)
+  actual, actual_scores = batched_trajectories(seeds, num_players, ticks, decide)
+  return np.abs(expected - actual).max(), expected_scores, actual_scores
+
+def batched_ticks_per_second(num_worlds, num_players=2, ticks=200):
+  # world ticks per second, batched and with game_logic
+  import batched_worlds
+  worlds = batched_worlds.BatchedWorlds(list(range(num_worlds)), num_players)
+  start = time.perf_counter()
+  for _ in range(ticks):
+    batched_worlds.fetch_goals(worlds)
+    worlds.step()
+  batched = num_worlds * ticks / (time.perf_counter() - start)
+  start = time.perf_counter()
+  object_trajectories([0], num_players, ticks, batched_worlds.fetch_goals)
+  objects = ticks / (time.perf_counter() - start)
+  return batched, objects
+
+def batched_cluster_check(batches=10, num_worlds=200, seed=0):
+  # the number of worlds, with dense clusters of seekers and goals, in
+  # which the collision passes of BatchedWorlds and game_logic differ
+  import numpy as np
+  import batched_worlds
+  rng = random.Random(seed)
+  different = 0
+  for _ in range(batches):
+    size = (rng.choice(cluster_world_sizes), rng.choice(cluster_world_sizes))
+    worlds = batched_worlds.BatchedWorlds(list(range(num_worlds)), 2, 5, 6, *size)
+    world = worlds.world
+    n = worlds.seeker_positions.shape[1]
+    expected = []
+    for w in range(num_worlds):
+      centers = [ Vector(rng.uniform(0, world.width), rng.uniform(0, world.height))
+                  for _ in range(rng.randint(1, 4)) ]
+      physicals = []
+      for k in range(worlds.positions.shape[1]):
+        pos = cluster_position(rng, world, rng.choice(centers))
+        p = Seeker(k, pos) if k < n else Goal(pos)
+        p.velocity = Vector(rng.uniform(-5, 5), rng.uniform(-5, 5))
+        if k < n:
+          p.magnet.strength = rng.choice([0, 1])
+          worlds.magnets[w,k] = p.magnet.strength
+        worlds.positions[w,k] = tuple(p.position)
+        worlds.velocities[w,k] = tuple(p.velocity)
+        physicals.append(p)
+      handle_collisions_pairwise(physicals, world)
+      expected.append(physicals)
+    worlds.handle_collisions()
+    for w, physicals in enumerate(expected):
+      state = physical_state(physicals)
+      actual = [ (tuple(p), tuple(v), c)
+                 for p, v, c in zip( worlds.positions[w].tolist(), worlds.velocities[w].tolist()
+                                   , worlds.disabled_counters[w].tolist() + [0]*worlds.num_goals ) ]
+      if state != actual:
+        different += 1
+  return different
+
+def check_batched(ticks=1000, num_worlds=1000):
+  error, expected_scores, actual_scores = batched_parity_check(ticks)
+  print("maximal position difference after " + str(ticks) + " ticks: " + str(error))
+  print("scores: " + str(expected_scores.tolist()) + " / " + str(actual_scores.tolist()))
+  different = batched_cluster_check()
+  print("cluster worlds where the collisions differ: " + str(different))
+  batched, objects = batched_ticks_per_second(num_worlds)
+  print( "world ticks per second: %.0f batched (%d worlds), %.0f with game_logic"
+       % (batched, num_worlds, objects) )
+  return error < 1e-6 and (expected_scores == actual_scores).all() and different == 0
+
+
+# environment
+
+# The same seed has to give the same match after any number of resets,
+# and the same start as engine.setup_match.
+def reset_check(opponents=(), ticks=2000, seeds=(1, 2, 1)):
+  import numpy as np
+  import engine
+  import environment
+  env = environment.Environment(num_players=len(opponents) + 1, frame_skip=5, opponents=opponents)
+  rng = random.Random(0)
+  actions = [ [ (rng.uniform(0, 768), rng.uniform(0, 768), rng.choice([0, 1, -8]))
+                for _ in env.steered ]
+              for _ in range(ticks // env.frame_skip) ]
+  episodes = []
+  for seed in seeds:
+    observations = [env.reset(seed)]
+    for a in actions:
+      observations.append(env.step(a)[0])
+    episodes.append(np.array(observations))
+
+  # setup_match draws the goals first, then the seekers player by player
+  random.seed(seeds[0])
+  world = World(env.world.width, env.world.height)
+  goals = engine.new_goals(world)
+  seekers = [world.random_position() for _ in range(len(env.players) * len(env.players[0].seekers))]
+  observation = episodes[0][0]
+  num_seekers = len(seekers)
+  seeker_values = environment.seeker_values
+  goal_values = environment.goal_values
+  seeker_rows = observation[:num_seekers*seeker_values].reshape(-1, seeker_values)
+  goal_rows = observation[num_seekers*seeker_values:][:len(goals)*goal_values].reshape(-1, goal_values)
+  same_start = ( [tuple(g.position) for g in goals] == [tuple(r[:2]) for r in goal_rows]
+               and [tuple(s) for s in seekers] == [tuple(r[:2]) for r in seeker_rows] )
+  return bool((episodes[0] == episodes[2]).all()), same_start
+
+def steps_per_second(opponents=(), frame_skip=1, steps=2000):
+  import numpy as np
+  import environment
+  env = environment.Environment(num_players=len(opponents) + 1, frame_skip=frame_skip, opponents=opponents)
+  actions = np.zeros((len(env.steered), 3))
+  env.reset(0)
+  start = time.perf_counter()
+  for _ in range(steps):
+    observation, rewards, done, info = env.step(actions)
+    if done:
+      env.reset(0)
+  return steps / (time.perf_counter() - start)
+
+def check_environment(opponents=()):
+  same_episodes, same_start = reset_check(opponents)
+  print("same episode after resets: " + str(same_episodes))
+  print("same start as setup_match: " + str(same_start))
+  for frame_skip in (1, 5):
+    print( "steps per second with frame skip %d: %.0f"
+         % (frame_skip, steps_per_second(opponents, frame_skip)) )
+  return same_episodes and same_start
+
+
+# lookahead
+
+# simulate has to give the same positions as the game, and is compared
+# with copying the objects to simulate with
+def lookahead_setup(seed, num_players=2):
+  random.seed(seed)
+  world = World(768, 768)
+  goals = [Goal(world.random_position()) for _ in range(6)]
+  players = [Player("player " + str(i)) for i in range(num_players)]
+  for p in players:
+    p.seekers = [Seeker(i, world.random_position()) for i in range(5)]
+  return world, players, world.generate_camps(players), goals
+
+def random_orders(rng, seekers):
+  return [(rng.uniform(0, 768), rng.uniform(0, 768), rng.choice([0, 0, 1, -8])) for _ in seekers]
+
+def lookahead_parity_check(ticks=500, seed=42):
+  world, players, camps, goals = lookahead_setup(seed)
+  seekers = [s for p in players for s in p.seekers]
+  rng = random.Random(seed)
+  error = 0
+  now = lookahead.state(seekers, goals, camps, world)
+  for t in range(0, ticks, 50):
+    orders = random_orders(rng, seekers)
+    later = lookahead.simulate(now, orders, 50)
+    for s, (x, y, strength) in zip(seekers, orders):
+      s.target = Vector(x, y)
+      s.magnet.strength = strength
+    for _ in range(50):
+      game_logic.tick(players, camps, goals, None, world)
+    # scored goals respawn elsewhere in the game, continue from the game
+    now = lookahead.state(seekers, goals, camps, world)
+    if sum(later.scores) == 0:
+      error = max( error
+                 , max(abs(a - b) for s, t in zip(now.seekers, later.seekers) for a, b in zip(s[:4], t[:4]))
+                 , max(abs(a - b) for g, h in zip(now.goals, later.goals) for a, b in zip(g[:4], h[:4])) )
+  return error
+
+def lookahead_timings(repetitions=1000):
+  # seconds per clone, per simulated tick and per copy.deepcopy of the objects
+  world, players, camps, goals = lookahead_setup(0)
+  seekers = [s for p in players for s in p.seekers]
+  now = lookahead.state(seekers, goals, camps, world)
+  start = time.perf_counter()
+  for _ in range(repetitions):
+    now.clone()
+  clone = (time.perf_counter() - start) / repetitions
+  start = time.perf_counter()
+  for _ in range(repetitions // 10):
+    lookahead.simulate(now, (), 10)
+  simulated = (time.perf_counter() - start) / repetitions
+  start = time.perf_counter()
+  for _ in range(repetitions // 10):
+    copy.deepcopy((players, camps, goals, world))
+  deepcopy = (time.perf_counter() - start) / (repetitions // 10)
+  return clone, simulated, deepcopy
+
+def check_lookahead():
+  error = lookahead_parity_check()
+  print("maximal difference to the game: " + str(error))
+  clone, simulated, deepcopy = lookahead_timings()
+  print( "clone: %.2f us, simulated tick: %.1f us, deepcopy: %.1f us"
+       % (clone*1e6, simulated*1e6, deepcopy*1e6) )
+  return error == 0
+
+
+# vectors
+
+# Physical.collision as it was, making new vectors
+def old_collision(s, t, world, min_dist):
+  d = world.torus_difference(s.position,t.position)
+  if d.norm() != 0:
+    dn = d.normalized()
+    dv = t.velocity - s.velocity
+    dvdn = dv.dot(dn)
+    m = 2 / (s.mass + t.mass)
+    if dvdn < 0:
+      s.velocity = s.velocity + dn * (m * t.mass * dvdn)
+      t.velocity = t.velocity - dn * (m * s.mass * dvdn)
+    ddn = d.dot(dn)
+    if ddn < min_dist:
+      s.position = s.position + dn * (ddn - min_dist)
+      t.position = t.position - dn * (ddn - min_dist)
+
+def old_engine_check(ticks=2000, seeds=range(10), size=300):
+  # the number of matches without orders (in a small world, so that
+  # seekers collide), in which the seekers aim at their own positions
+  # until they are pushed, where the trajectories or targets of both
+  # engines differ
+  def run(seed):
+    random.seed(seed)
+    world = World(size, size)
+    goals = [Goal(world.random_position()) for _ in range(6)]
+    players = [Player("player " + str(i)) for i in range(4)]
+    for p in players:
+      p.seekers = [Seeker(i, world.random_position()) for i in range(5)]
+    camps = world.generate_camps(players)
+    seekers = [s for p in players for s in p.seekers]
+    trajectory = []
+    for _ in range(ticks):
+      game_logic.tick(players, camps, goals, None, world)
+      trajectory.append( [(tuple(s.position), tuple(s.target)) for s in seekers]
+                       + [tuple(g.position) for g in goals] )
+    return trajectory
+
+  different = 0
+  for seed in seeds:
+    trajectory = run(seed)
+    collision = Physical.collision
+    Physical.collision = old_collision
+    try:
+      expected = run(seed)
+    finally:
+      Physical.collision = collision
+    if trajectory != expected:
+      different += 1
+  return different
+
+def check_vectors():
+  different = old_engine_check()
+  print("matches without orders that differ from the old engine: " + str(different))
+  return different == 0
+
+
+checks = { "collisions": check_collisions
+         , "numpy": check_numpy
+         , "batched": check_batched
+         , "environment": check_environment
+         , "lookahead": check_lookahead
+         , "vectors": check_vectors }
+
+def main():
+  parser = argparse.ArgumentParser(description="parity checks of the game's engines")
+  parser.add_argument("checks", nargs="*", metavar="CHECK",
+      help="the checks to run: " + ", ".join(checks) + " (default: all)")
+  args = parser.parse_args()
+  for name in args.checks:
+    if name not in checks:
+      parser.error("unknown check: " + name)
+  failed = []
+  for name in args.checks or checks:
+    print(name + ":")
+    if not checks[name]():
+      failed.append(name)
+  if failed:
+    print("failed: " + ", ".join(failed))
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
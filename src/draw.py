@@ -8,50 +8,133 @@ player_name_images = {}
 font = None
 background_color = [0, 0, 30]
 
-def init(players):
+# rendered texts by (text, color), see text_image
+text_images = {}
+max_text_images = 1000
+# rendered scores by player name, as (score, image)
+score_images = {}
+# pre-rendered circles by (color, radius, width), see blit_circle
+circle_sprites = {}
+# the profiler overlay, as (lines, images), see draw_profile
+profile_images = ([], [])
+small_font = None
+# color variants of the players' colors, see seeker_color
+player_colors = {}
+# the halo and magnet colors of every color, see shades
+color_shades = {}
+
+# With dirty rects, only the parts of the screen that were drawn on in
+# this or the previous frame are cleared and sent to the display, instead
+# of the whole screen. drawn_rects collects the screen areas of everything
+# drawn in the current frame, except for the camps, which never move.
+dirty_rects = False
+drawn_rects = []
+full_update = True
+
+def init(players, use_dirty_rects=False):
   global font
+  global small_font
   global name_images
+  global dirty_rects
+
+  dirty_rects = use_dirty_rects
+  redraw_all()
 
   font = pygame.font.SysFont("monospace", 20, bold=True)
+  small_font = pygame.font.SysFont("monospace", 12)
 
   for p in players:
     player_name_images[p.name] = font.render(p.name, True, p.color)
-    
+    player_colors[p.name] = color_variants(p.color)
+    for color in player_colors[p.name].values():
+      shades(color)
+
+def color_variants(color):
+  # by (disabled, dummy)
+  variants = {}
+  for disabled in (False, True):
+    for dummy in (False, True):
+      c = color
+      if disabled:
+        c = interpolate_color(c, [0, 0, 0], 0.5)
+      if dummy:
+        c = interpolate_color(c, [1, 1, 1], 0.5)
+      variants[(disabled, dummy)] = c
+  return variants
+
+def seeker_color(seeker, player):
+  if player.name not in player_colors:
+    player_colors[player.name] = color_variants(player.color)
+  return player_colors[player.name][(seeker.disabled(), player.ai.is_dummy)]
 
-def draw(players, camps, goals, animations, clock, world, screen):
-  # clear screen
-  screen.fill(background_color)
+def shades(color):
+  # the halo colors for the 50 steps of its pulse, and the magnet ring
+  # colors for their 50 possible radii
+  key = tuple(color)
+  if key not in color_shades:
+    halo = [ interpolate_color(color, [0,0,0], abs(math.sin(step / 50 * 2 * math.pi))**2)
+             for step in range(50) ]
+    rings = [ interpolate_color(color, [0,0,0], mu / 50) for mu in range(50) ]
+    color_shades[key] = (halo, rings)
+  return color_shades[key]
+
+
+def redraw_all():
+  # the next frame updates the whole screen, e.g. after the window was
+  # covered
+  global full_update
+  full_update = True
+
+def draw(players, camps, goals, animations, clock, world, screen, profile=None):
+  # profile: a profiler.Profiler timing the stages, or None
+  global drawn_rects
+  global full_update
+  if profile is not None: profile.start()
+  previous_rects = drawn_rects
+  drawn_rects = []
+  # clear screen (everything but the camps was drawn within previous_rects)
+  if dirty_rects and not full_update:
+    for r in previous_rects:
+      screen.fill(background_color, r)
+  else:
+    screen.fill(background_color)
+  if profile is not None: profile.lap("draw clear")
   # draw camps
   draw_camps(camps, screen)
   # draw goals
   for g in goals:
     draw_goal(g, world, screen)
+  if profile is not None: profile.lap("draw camps, goals")
   # draw jet streams
   for p in players:
     for s in p.seekers:
       a = s.acceleration
       if (not s.disabled() and a.norm()>0):
         draw_jet_stream(s.position, -a, world, screen)
+  if profile is not None: profile.lap("draw jets")
   # draw seekers
   for p in players:
     for s in p.seekers:
       draw_seeker(s, p, world, screen)
+  if profile is not None: profile.lap("draw seekers")
   # draw animations
-  for a in animations["score"]:
+  for a in animations:
     draw_score_animation(a, world, screen)
   # draw information (player's scores, etc.)
-  draw_information(players, Vector(10,10), clock, world, screen)
+  draw_information(players, Vector(10,10), clock, world, screen, profile)
+  if profile is not None: profile.lap("draw information")
   # actually update display
-  pygame.display.flip()
+  if dirty_rects and not full_update:
+    pygame.display.update(previous_rects + drawn_rects)
+  else:
+    pygame.display.flip()
+    full_update = False
+  if profile is not None: profile.lap("display update")
 
 
 def draw_seeker(seeker, player, world, screen):
-  color = player.color
+  color = seeker_color(seeker, player)
   pos = seeker.position
-  if seeker.disabled():
-    color = interpolate_color(color, [0, 0, 0], 0.5)
-  if player.ai.is_dummy:
-    color = interpolate_color(color, [1, 1, 1], 0.5)
   draw_item(color, pos, Seeker.radius, world, screen)
   draw_halo(seeker, color, screen)
   if world.debug_mode:
@@ -68,28 +151,48 @@ def draw_goal(goal, world, screen):
 
 
 def draw_text(text, color, pos, screen, center=True):
-  global font
-  (dx,dy) = font.size(text)
+  draw_image(text_image(text, color), pos, screen, center)
+
+def draw_image(image, pos, screen, center=True):
+  (dx,dy) = image.get_size()
   adj_pos = pos - Vector(dx,dy) / 2 if center else pos
-  screen.blit( font.render(text, False, color)
-               , tuple(adj_pos) )
+  drawn_rects.append(screen.blit(image, tuple(adj_pos)))
+
+def text_image(text, color):
+  global font
+  key = (text, tuple(color))
+  image = text_images.get(key)
+  if image is None:
+    if len(text_images) >= max_text_images:
+      text_images.clear()
+    image = font.render(text, False, color)
+    text_images[key] = image
+  return image
+
+def score_image(player):
+  # re-rendered only when the score changed
+  score, image = score_images.get(player.name, (None, None))
+  if score != player.score:
+    image = font.render(str(player.score), False, player.color)
+    score_images[player.name] = (player.score, image)
+  return image
 
 
 def draw_halo(seeker, color, screen):
   if seeker.disabled():
     return
 
-  mu = abs(math.sin((int(pygame.time.get_ticks() / 30) % 50) / 50 * 2 * math.pi))**2
-  pygame.draw.circle(screen, interpolate_color(color, [0,0,0], mu),
-      (int(seeker.position.x), int(seeker.position.y)), 3 + Seeker.radius, 3)
+  halo, rings = shades(color)
+  ticks = pygame.time.get_ticks()
+  center = (int(seeker.position.x), int(seeker.position.y))
+  blit_circle(screen, halo[int(ticks / 30) % 50], center, 3 + Seeker.radius, 3)
 
   if not seeker.magnet.is_on():
     return
 
   for offset in 0, 10, 20, 30, 40:
-    mu = int(-seeker.magnet.strength * pygame.time.get_ticks() / 50 + offset) % 50
-    pygame.draw.circle(screen, interpolate_color(color, [0,0,0], (mu) / 50),
-      (int(seeker.position.x), int(seeker.position.y)), mu + Seeker.radius, 2)
+    mu = int(-seeker.magnet.strength * ticks / 50 + offset) % 50
+    blit_circle(screen, rings[mu], center, mu + Seeker.radius, 2)
 
 
 def draw_camps(camps, screen):
@@ -106,16 +209,18 @@ def draw_camps(camps, screen):
 
 
 def draw_item(color, center, radius, world, screen):
-  for (dx, dy) in repetition_offsets(world):
-    pygame.draw.circle(screen, color,
+  for (dx, dy) in circle_offsets(center, radius, world):
+    blit_circle(screen, color,
       (int(center.x+dx), int(center.y+dy)), radius)
 
 def draw_jet_stream(origin, direction, world, screen):
   def line(a, b):
-    for dx, dy in repetition_offsets(world):
-      pygame.draw.line(screen, [255, 255, 255],
+    offsets = visible_offsets( min(a.x, b.x), min(a.y, b.y)
+                             , max(a.x, b.x), max(a.y, b.y), world )
+    for dx, dy in offsets:
+      drawn_rects.append(pygame.draw.line(screen, [255, 255, 255],
           (int(a.x+dx), int(a.y+dy))
-        , (int(b.x+dx), int(b.y+dy)))
+        , (int(b.x+dx), int(b.y+dy))))
 
   for _ in range(0, 2):
     t = direction.rotated() * (random.uniform(-1, 1)
@@ -125,19 +230,38 @@ def draw_jet_stream(origin, direction, world, screen):
 
 def draw_score_animation(a, world, screen):
   t = a.age / a.duration
-  r = Goal.radius + 100*t
-  for dx, dy in repetition_offsets(world):
-    pygame.draw.circle(screen, a.color,
-      (int(a.position.x+dx), int(a.position.y+dy)), int(r), 1)
-
-def repetition_offsets(world):
-  l = []
-  for ix in [-1, 0, 1]:
-    for iy in [-1, 0, 1]:
-      l.append((ix*world.width, iy*world.height))
-  return l
-
-def draw_information(players, pos, clock, world, screen):
+  r = int(Goal.radius + 100*t)
+  for dx, dy in circle_offsets(a.position, r, world):
+    blit_circle(screen, a.color,
+      (int(a.position.x+dx), int(a.position.y+dy)), r, 1)
+
+def blit_circle(screen, color, center, radius, width=0):
+  # draws the same pixels as pygame.draw.circle, which covers
+  # [center - radius, center + radius) in both directions
+  key = (tuple(color), radius, width)
+  sprite = circle_sprites.get(key)
+  if sprite is None:
+    sprite = pygame.Surface((2*radius, 2*radius), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (radius, radius), radius, width)
+    sprite = sprite.convert_alpha()
+    circle_sprites[key] = sprite
+  drawn_rects.append(screen.blit(sprite, (center[0] - radius, center[1] - radius)))
+
+def circle_offsets(center, radius, world):
+  return visible_offsets( center.x - radius - 1, center.y - radius - 1
+                        , center.x + radius + 1, center.y + radius + 1, world )
+
+def visible_offsets(left, top, right, bottom, world):
+  # Everything is drawn again shifted by the world's size, so that it
+  # wraps around the edges. Only the copies overlapping the screen
+  # are needed; usually that is just the original.
+  xs = [ dx for dx in (-world.width, 0, world.width)
+         if right + dx > -1 and left + dx <= world.width ]
+  ys = [ dy for dy in (-world.height, 0, world.height)
+         if bottom + dy > -1 and top + dy <= world.height ]
+  return [(dx, dy) for dx in xs for dy in ys]
+
+def draw_information(players, pos, clock, world, screen, profile=None):
   global name_images
   global font
 
@@ -145,10 +269,22 @@ def draw_information(players, pos, clock, world, screen):
     # draw fps
     fps = int(clock.get_fps())
     draw_text(str(fps), [250,250,250], pos, screen,center=False)
+    if profile is not None:
+      draw_profile(profile, pos + Vector(250,0), screen)
   dx = Vector(40,0)
   dy = Vector(0,30)
   pos += dy
   for p in players:
-    draw_text(str(p.score), p.color, pos, screen, center=False)
-    screen.blit(player_name_images[p.name], tuple(pos + dx))
+    draw_image(score_image(p), pos, screen, center=False)
+    draw_image(player_name_images[p.name], pos + dx, screen, center=False)
     pos += dy
+
+def draw_profile(profile, pos, screen):
+  # the phases' percentiles, re-rendered only when they were recomputed
+  global profile_images
+  lines = profile.overlay_lines()
+  if lines is not profile_images[0]:
+    profile_images = (lines, [small_font.render(l, False, [250,250,250]) for l in lines])
+  for image in profile_images[1]:
+    draw_image(image, pos, screen, center=False)
+    pos += Vector(0, image.get_height())
@@ -0,0 +1,100 @@
+from seekers_types import *
+import ai_process
+import file_watcher
+
+import sys
+import glob
+import time
+import pickle
+import random
+
+
+# everything needed to set up and run a match, without pygame
+
+num_goals = 6
+num_seekers = 5
+tournament_steps = 10000
+speedup_factor = 7
+ai_time_limit = 0.05  # seconds per tick, in the interactive game
+ai_wait_limit = 5.0  # seconds an ai may take when the match waits for it
+reload_poll_interval = 1.0  # seconds, where inotify is not used
+reload_polling = False  # poll the ai files even where inotify works
+
+def find_ai_files():
+  filenames = []
+  for search_path in ("", "./src/ais/"):
+    filenames += glob.glob(search_path + "ai*.py")
+  return filenames
+
+def load_players(filenames):
+  return [load_player(filename) for filename in filenames]
+
+def load_player(filename):
+  name = filename[:-3]
+  p    = Player(name)
+  p.ai = load_ai(filename)
+  return p
+
+def load_ai(filename):
+  # the ai is compiled and run in its own worker process
+  return ai_process.AiProcess(filename)
+
+def close_ais(players):
+  for p in players:
+    p.ai.close()
+
+def new_goals(world):
+  return [Goal(world.random_position()) for _ in range(0, num_goals)]
+
+def reset(players, world):
+  for p in players:
+    p.seekers = [Seeker(i,world.random_position()) for i in range(0, num_seekers)]
+
+def setup_match(filenames, world, seed=42):
+  random.seed(seed)
+  goals = new_goals(world)
+  players = load_players(filenames)
+  reset(players, world)
+  camps = world.generate_camps(players)
+  return players, camps, goals
+
+def winner(players):
+  return sorted(players, key=lambda p: p.score, reverse=True)[0]
+
+def watch_ais(players):
+  return file_watcher.FileWatcher( [p.ai.filename for p in players]
+                                 , reload_poll_interval, reload_polling )
+
+def reload_changed_ais(players, watcher):
+  changed = watcher.changed()
+  for p in players:
+    if p.ai.filename in changed:
+      p.ai.close()
+      p.ai = load_ai(p.ai.filename)
+
+def call_ais(players, camps, goals, world, profile=None, time_limit=None):
+  # profile: a profiler.Profiler, or None
+  # time_limit: seconds the ais may think, or None to wait for all of them,
+  # so that the match does not depend on how fast the machine is; an ai
+  # that takes longer than ai_wait_limit then hangs, and is stopped
+  if profile is not None: profile.start()
+  snapshot_data = pickle.dumps(Snapshot(players, goals, camps, world))
+  if profile is not None: profile.lap("snapshot")
+  asked = [p for i,p in enumerate(players) if p.ai.request(i, snapshot_data)]
+  # all ais think at the same time, late ones keep their previous orders
+  deadline = time.monotonic() + (ai_wait_limit if time_limit is None else time_limit)
+  for p in asked:
+    orders = p.ai.collect(deadline)
+    if orders is not None:
+      give_orders(p, orders)
+      if profile is not None: profile.add("ai " + p.name, p.ai.think_time)
+    elif time_limit is None and p.ai.alive:
+      print( "The AI of Player " + p.name + " took longer than "
+           + str(ai_wait_limit) + " seconds and was stopped", file=sys.stderr )
+      p.ai.close()
+  if profile is not None: profile.lap("waiting for ais")
+
+def give_orders(player, orders):
+  for s, (x, y, strength) in zip(player.seekers, orders):
+    s.target = Vector(x, y)
+    s.magnet.strength = strength
@@ -0,0 +1,142 @@
+from seekers_types import *
+import game_logic
+import ai_process
+import engine
+
+import math
+
+import numpy as np
+
+
+# A step/reset interface to a match, for training bots, in the style of
+# gym environments. It runs game_logic.tick without pygame and without ai
+# processes:
+#
+#   env = Environment(num_players=2, frame_skip=4, opponents=["src/ais/ai0.py"])
+#   observation = env.reset(seed)
+#   while True:
+#     observation, rewards, done, info = env.step(actions)
+#
+# The first players are steered by the actions, the opponents (ai files)
+# play the remaining ones; they are run in this process, every tick, like
+# in a match. actions are the orders of all steered seekers, player by
+# player, as (target x, target y, magnet strength) in any array-like of
+# shape (..., 3). Each step gives them, runs frame_skip ticks and returns
+# the goals every player scored in them as rewards. The orders are held to
+# what ais can give (see Seeker.copy_alterables): targets are wrapped into
+# the world, magnet strengths rounded to whole numbers and clamped to the
+# range of Magnet.is_magnet, and anything not finite is a ValueError.
+#
+# Observations are flat float arrays of observation_size values:
+#
+#   per seeker:  x, y, velocity x, velocity y, magnet strength, disabled counter
+#   per goal:    x, y, velocity x, velocity y, owner (player index, -1 for
+#                none), owned for
+#   per player:  score
+#
+# All objects are made once; reset(seed) only puts them back, in the same
+# random order as engine.setup_match, so the match starts exactly like a
+# match with that seed. Every environment has its own random generator, so
+# several of them don't disturb each other. checks.py checks that and
+# measures the steps per second.
+
+seeker_values = 6
+goal_values = 6
+
+class Environment:
+  def __init__( self, num_players=2, frame_skip=1, opponents=()
+              , ticks=(engine.tournament_steps+1)*engine.speedup_factor
+              , num_seekers=engine.num_seekers, num_goals=engine.num_goals
+              , width=768, height=768 ):
+    if len(opponents) >= num_players:
+      raise ValueError("at least one player has to be steered by the actions")
+    self.frame_skip = frame_skip
+    self.ticks = ticks
+    self.world = SeededWorld(width, height)
+    self.num_steered = num_players - len(opponents)
+    self.players = [Player("player " + str(i)) for i in range(self.num_steered)]
+    self.players += [Player(filename[:-3]) for filename in opponents]
+    for p in self.players:
+      p.seekers = [Seeker(i, Vector(0, 0)) for i in range(num_seekers)]
+    self.ais = [ai_process.compile_ai(filename) for filename in opponents]
+    self.goals = [Goal(Vector(0, 0)) for _ in range(num_goals)]
+    self.camps = self.world.generate_camps(self.players)
+    self.steered = [s for p in self.players[:self.num_steered] for s in p.seekers]
+    self.observation_size = ( len(self.players) * num_seekers * seeker_values
+                            + num_goals * goal_values
+                            + len(self.players) )
+    self.observation = np.zeros(self.observation_size)
+    self.tick = 0
+
+  def reset(self, seed=None):
+    world = self.world
+    world.rng.seed(seed)
+    for g in self.goals:
+      reset_physical(g, world)
+      g.owner = None
+      g.owned_for = 0
+    for p in self.players:
+      p.score = 0
+      for s in p.seekers:
+        reset_physical(s, world)
+        s.target = s.position
+        s.disabled_counter = 0
+        s.magnet.strength = 0
+    self.tick = 0
+    return self.observe()
+
+  def step(self, actions):
+    orders = np.asarray(actions, dtype=float).reshape(-1, 3).tolist()
+    if len(orders) != len(self.steered):
+      raise ValueError( "expected orders for " + str(len(self.steered))
+                      + " seekers, got " + str(len(orders)) )
+    for s, (x, y, strength) in zip(self.steered, orders):
+      s.target, s.magnet.strength = valid_order(x, y, strength, self.world)
+    before = [p.score for p in self.players]
+    for _ in range(self.frame_skip):
+      if self.tick >= self.ticks:
+        break
+      self.call_opponents()
+      game_logic.tick(self.players, self.camps, self.goals, None, self.world)
+      self.tick += 1
+    rewards = np.array([p.score - b for p, b in zip(self.players, before)])
+    done = self.tick >= self.ticks
+    return self.observe(), rewards, done, {"tick": self.tick}
+
+  def call_opponents(self):
+    if not self.ais:
+      return
+    snapshot = Snapshot(self.players, self.goals, self.camps, self.world)
+    for i, ai in enumerate(self.ais, self.num_steered):
+      engine.give_orders(self.players[i], ai_process.decide(ai, snapshot, i))
+
+  def observe(self):
+    owners = {id(p): i for i, p in enumerate(self.players)}
+    values = []
+    for p in self.players:
+      for s in p.seekers:
+        values += ( s.position.x, s.position.y, s.velocity.x, s.velocity.y
+                  , s.magnet.strength, s.disabled_counter )
+    for g in self.goals:
+      values += ( g.position.x, g.position.y, g.velocity.x, g.velocity.y
+                , owners.get(id(g.owner), -1), g.owned_for )
+    values += [p.score for p in self.players]
+    self.observation[:] = values
+    return self.observation.copy()
+
+def valid_order(x, y, strength, world):
+  # the target and magnet strength of an order, as an ai could give them
+  if not all(math.isfinite(v) for v in (x, y, strength)):
+    raise ValueError("orders have to be finite numbers")
+  target = Vector(x, y)
+  world.normalize_position(target)
+  # the strengths Magnet.is_magnet allows
+  return target, min(1, max(-8, int(round(strength))))
+
+def reset_physical(p, world):
+  position = world.random_position()
+  p.position.x = position.x
+  p.position.y = position.y
+  p.velocity.x = 0
+  p.velocity.y = 0
+  p.acceleration = Vector(0, 0)
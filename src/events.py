@@ -0,0 +1,103 @@
+from seekers_types import *
+
+
+# What happens during the ticks, as a stream of events: goals scored,
+# seekers disabled, collisions and goals changing their owner.
+#
+# game_logic.tick (and numpy_physics.ArrayPhysics.tick) emit them into an
+# EventStream, whose records are allocated once and then reused, as a ring
+# buffer. Whoever runs the game calls drain() now and then (seekers.py once
+# per frame), which hands the events since the last drain to every
+# subscriber at once, as subscriber(events, tick), tick being the current
+# one. The records are reused afterwards, so subscribers have to copy what
+# they want to keep. If more events than the capacity come up between two
+# drains, the oldest are lost, and counted in dropped.
+#
+#   kind                subject   other                          position
+#   GOAL_SCORED         player    the scored goal                of the goal
+#   SEEKER_DISABLED     seeker    the seeker it collided with    of the seeker
+#   COLLISION           seeker    seeker or goal (or both goals) of subject
+#   OWNERSHIP_CHANGED   goal      its new owner (a player)       of the goal
+
+GOAL_SCORED = 0
+SEEKER_DISABLED = 1
+COLLISION = 2
+OWNERSHIP_CHANGED = 3
+
+kind_names = ["goal scored", "seeker disabled", "collision", "ownership changed"]
+
+class Event:
+  __slots__ = ("kind", "tick", "subject", "other", "x", "y")
+
+  def __init__(self):
+    self.kind = None
+    self.tick = 0
+    self.subject = None
+    self.other = None
+    self.x = 0.0
+    self.y = 0.0
+
+class EventStream:
+  def __init__(self, capacity=4096):
+    self.records = [Event() for _ in range(capacity)]
+    self.capacity = capacity
+    self.start = 0  # the oldest undrained record
+    self.count = 0
+    self.dropped = 0
+    self.tick = 0
+    self.subscribers = []
+
+  def subscribe(self, subscriber):
+    self.subscribers.append(subscriber)
+
+  def emit(self, kind, subject, other, position):
+    if self.count == self.capacity:
+      # full, the oldest record is overwritten
+      self.start = (self.start + 1) % self.capacity
+      self.count -= 1
+      self.dropped += 1
+    e = self.records[(self.start + self.count) % self.capacity]
+    self.count += 1
+    e.kind = kind
+    e.tick = self.tick
+    e.subject = subject
+    e.other = other
+    e.x = position.x
+    e.y = position.y
+
+  def drain(self):
+    end = self.start + self.count
+    if end <= self.capacity:
+      events = self.records[self.start:end]
+    else:
+      events = self.records[self.start:] + self.records[:end - self.capacity]
+    self.start = end % self.capacity
+    self.count = 0
+    for subscriber in self.subscribers:
+      subscriber(events, self.tick)
+
+
+class ScoreAnimations:
+  # A subscriber that keeps the score animations for draw.draw: one for
+  # every goal scored, until it is ScoreAnimation.duration ticks old.
+  def __init__(self):
+    self.animations = []
+    self.tick = 0
+
+  def __call__(self, events, tick):
+    self.advance(tick)
+    for e in events:
+      if e.kind == GOAL_SCORED:
+        self.add(Vector(e.x, e.y), e.subject.color, tick - e.tick)
+
+  def advance(self, tick):
+    for a in self.animations:
+      a.age += tick - self.tick
+    self.tick = tick
+    self.animations = [a for a in self.animations if a.age <= a.duration]
+
+  def add(self, position, color, age=0):
+    if age <= ScoreAnimation.duration:
+      a = ScoreAnimation(position, color)
+      a.age = age
+      self.animations.append(a)
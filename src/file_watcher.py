@@ -0,0 +1,159 @@
+import os
+import os.path
+import time
+import struct
+import select
+import threading
+import ctypes
+import ctypes.util
+
+
+# Watches a set of files in a background thread and remembers which of them
+# changed. Uses inotify where it is available (on the directories, so that
+# editors which save by renaming a new file are noticed as well), and
+# otherwise polls the files' ctimes every poll_interval seconds: for all
+# files if inotify is missing or polling is asked for, and for the files in
+# directories that inotify cannot watch, or that are on network filesystems
+# (inotify does not see changes made by other clients of an nfs or smb
+# share).
+#
+# changed() is cheap and can be called as often as wanted.
+
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+watch_mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ATTRIB
+event_header = struct.Struct("iIII")
+
+class FileWatcher:
+  def __init__(self, filenames, poll_interval=1.0, polling=False):
+    self.poll_interval = poll_interval
+    self.lock = threading.Lock()
+    self.changed_files = set()
+    self.stopped = threading.Event()
+    # (directory, basename) -> filenames as given
+    self.watched = {}
+    for f in filenames:
+      key = os.path.split(os.path.abspath(f))
+      self.watched.setdefault(key, []).append(f)
+
+    # inotify watches by descriptor, and the polled files' ctimes
+    self.directories = {}
+    self.ctimes = {}
+    self.inotify_fd = None if polling else open_inotify()
+    for directory in {d for d,_ in self.watched}:
+      if self.inotify_fd is not None and not network_filesystem(directory):
+        wd = add_watch(self.inotify_fd, directory)
+        if wd >= 0:
+          self.directories[wd] = directory
+          continue
+      for (d, _), files in self.watched.items():
+        if d == directory:
+          for f in files:
+            self.ctimes[f] = ctime(f)
+    if self.inotify_fd is not None and not self.directories:
+      os.close(self.inotify_fd)
+      self.inotify_fd = None
+    self.thread = threading.Thread(target=self.run, daemon=True)
+    self.thread.start()
+
+  def changed(self):
+    # returns the files that changed since the last call
+    if not self.changed_files:
+      return set()
+    with self.lock:
+      changed, self.changed_files = self.changed_files, set()
+    return changed
+
+  def mark_changed(self, filenames):
+    with self.lock:
+      self.changed_files.update(filenames)
+
+  def run(self):
+    last_poll = time.monotonic()
+    while not self.stopped.is_set():
+      if self.inotify_fd is not None:
+        ready, _, _ = select.select([self.inotify_fd], [], [], self.poll_interval)
+        if ready:
+          self.read_events()
+      elif self.stopped.wait(self.poll_interval):
+        return
+      if self.ctimes and time.monotonic() - last_poll >= self.poll_interval:
+        last_poll = time.monotonic()
+        self.poll()
+
+  def read_events(self):
+    try:
+      data = os.read(self.inotify_fd, 4096)
+    except BlockingIOError:
+      return
+    offset = 0
+    while offset < len(data):
+      wd, mask, cookie, length = event_header.unpack_from(data, offset)
+      offset += event_header.size
+      name = data[offset:offset+length].rstrip(b"\0").decode(errors="replace")
+      offset += length
+      key = (self.directories.get(wd), name)
+      if key in self.watched:
+        self.mark_changed(self.watched[key])
+
+  def poll(self):
+    for f, t in self.ctimes.items():
+      new = ctime(f)
+      if new != t:
+        self.ctimes[f] = new
+        self.mark_changed([f])
+
+  def close(self):
+    self.stopped.set()
+    self.thread.join()
+    if self.inotify_fd is not None:
+      os.close(self.inotify_fd)
+
+
+def ctime(filename):
+  try:
+    return os.path.getctime(filename)
+  except OSError:
+    return None
+
+libc = None
+
+def open_inotify():
+  global libc
+  try:
+    if libc is None:
+      libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+  except (OSError, AttributeError):
+    return None
+  return fd if fd >= 0 else None
+
+def add_watch(fd, directory):
+  return libc.inotify_add_watch(fd, os.fsencode(directory), watch_mask)
+
+
+# filesystem types whose changes by other machines inotify does not see
+network_filesystems = { "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "9p"
+                      , "afs", "ceph", "glusterfs", "lustre", "fuse.sshfs" }
+
+def network_filesystem(directory):
+  # whether directory is on a network filesystem, by the longest mount
+  # point containing it in /proc/mounts (which is Linux only, like inotify)
+  try:
+    with open("/proc/mounts") as f:
+      mounts = [line.split()[1:3] for line in f]
+  except OSError:
+    return False
+  path = os.path.realpath(directory)
+  best, fstype = "", None
+  for mount_point, kind in mounts:
+    mount_point = mount_point.replace("\\040", " ")
+    inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+    if inside and len(mount_point) > len(best):
+      best, fstype = mount_point, kind
+  return fstype in network_filesystems
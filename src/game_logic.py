@@ -1,57 +1,197 @@
 from seekers_types import *
+import events as ev
 
-import random
-import copy
+import functools
 import utils
 
 
-def tick(players, camps, goals, animations, world):
+def tick(players, camps, goals, events, world, profile=None):
+  # events: an events.EventStream for what happens, or None
+  # profile: a profiler.Profiler timing the phases, or None
   seekers = [s for p in players for s in p.seekers]
+  if profile is not None: profile.start()
+  move_seekers(seekers, world)
+  if profile is not None: profile.lap("move seekers")
+  move_goals(seekers, goals, world)
+  if profile is not None: profile.lap("magnets, goals")
+  handle_collisions(seekers + goals, world, events)
+  if profile is not None: profile.lap("collisions")
+  score_goals(camps, goals, events, world)
+  if profile is not None: profile.lap("scoring")
+  if events is not None:
+    events.tick += 1
+
+def move_seekers(seekers, world):
   # move and recover seekers
   for s in seekers:
     s.move(world)
     if s.disabled():
       s.disabled_counter -= 1
+
+def move_goals(seekers, goals, world):
   # compute magnetic forces and move goals
-  for g in goals:
-    force = Vector(0,0)
-    for s in seekers:
-      force += s.magnetic_force(world,g.position)
+  for g, force in zip(goals, magnetic_forces(seekers, goals, world)):
     g.acceleration = force
     g.move(world)
-  # handle collisions
-  physicals = seekers + goals
-  for i in range(0, len(physicals)):
-    s = physicals[i]
-    for j in range(i+1, len(physicals)):
-      t = physicals[j]
-      d = world.torus_distance(t.position,s.position)
-      min_dist = s.radius + t.radius
-      # ^ bit of a hack; will only work with seekers and goals
-      if d < min_dist:
-        if isinstance(s,Seeker) and isinstance(t,Seeker):
-          Seeker.collision(s, t, world, min_dist)
-        else:
-          Physical.collision(s, t, world, min_dist)
-  # handle goals and scoring
+
+# Sum of Seeker.magnetic_force over all seekers, for every goal.
+# Magnets only reach a tenth of the world's diameter (utils.bump is zero
+# beyond), so the active magnets are sorted into a grid with cells of at
+# least that size, and only those in the cells around a goal are looked
+# at. They are added up in seeker order, so the result is exactly the same.
+def magnetic_forces(seekers, goals, world):
+  diameter, reach = field_constants(world.width, world.height)
+  forces = [Vector(0,0) for _ in goals]
+  magnets = [s for s in seekers if s.magnet.is_on() and not s.disabled()]
+  if not magnets:
+    return forces
+
+  nx = max(1, int(world.width // reach))
+  ny = max(1, int(world.height // reach))
+  cell_width = world.width / nx
+  cell_height = world.height / ny
+  def cell(pos):
+    return ( int(pos.x // cell_width) % nx
+           , int(pos.y // cell_height) % ny )
+
+  grid = {}
+  for i,s in enumerate(magnets):
+    grid.setdefault(cell(s.position), []).append(i)
+
+  for g, force in zip(goals, forces):
+    cx, cy = cell(g.position)
+    near = []
+    for c in { ((cx+dx) % nx, (cy+dy) % ny)
+               for dx in (-1,0,1) for dy in (-1,0,1) }:
+      near += grid.get(c, ())
+    for i in sorted(near):
+      s = magnets[i]
+      r = world.torus_distance(s.position,g.position) / diameter
+      if r*10 < 1:
+        d = world.torus_direction(s.position,g.position)
+        force.iadd(d.scale(- s.magnet.strength * utils.bump(r*10)))
+  return forces
+
+@functools.lru_cache()
+def field_constants(width, height):
+  # the world's diameter and the reach of the magnets
+  diameter = World(width, height).diameter()
+  return diameter, diameter / 10
+
+# The collision pass tests the pairs (i, j), i < j, of all physicals in
+# this order, each with the positions it has by then (earlier collisions in
+# the pass push physicals around). Only pairs in neighbouring cells of a
+# uniform grid on the torus can collide, since the cells are wider than any
+# collision distance; see CollisionGrid.
+def handle_collisions(physicals, world, events=None):
+  grid = CollisionGrid(physicals, world)
+  for i in range(len(physicals)):
+    last = i
+    while True:
+      moved = False
+      for j in grid.candidates(i, last):
+        last = j
+        if collide(physicals[i], physicals[j], world, events):
+          grid.update(j)
+          if grid.update(i):
+            moved = True
+            break
+      # while i's row is handled only i and its partners move, so its
+      # remaining candidates only change when i changes its cell
+      if not moved:
+        break
+
+def collide(s, t, world, events):
+  # whether s and t collided
+  d = world.torus_distance(t.position,s.position)
+  min_dist = s.radius + t.radius
+  # ^ bit of a hack; will only work with seekers and goals
+  if d >= min_dist:
+    return False
+  if events is not None:
+    events.emit(ev.COLLISION, s, t, s.position)
+  if isinstance(s,Seeker) and isinstance(t,Seeker):
+    was_disabled = (s.disabled_counter, t.disabled_counter)
+    Seeker.collision(s, t, world, min_dist)
+    if events is not None:
+      emit_disabled(events, s, t, was_disabled)
+  else:
+    Physical.collision(s, t, world, min_dist)
+  return True
+
+def emit_disabled(events, s, t, was_disabled):
+  # seekers that were just disabled by their collision (a seeker disabled
+  # twice in a tick only counts once)
+  for seeker, other, before in ((s, t, was_disabled[0]), (t, s, was_disabled[1])):
+    if seeker.disabled_counter == Seeker.disabled_time != before:
+      events.emit(ev.SEEKER_DISABLED, seeker, other, seeker.position)
+
+def score_goals(camps, goals, events, world):
   for i,g in enumerate(goals):
     for camp in camps:
-      if g.camp_tick(camp):
-        goal_scored(g.owner, i, goals, animations, world)
+      owner = g.owner
+      scored = g.camp_tick(camp)
+      if events is not None and g.owner is not owner:
+        events.emit(ev.OWNERSHIP_CHANGED, g, g.owner, g.position)
+      if scored:
+        goal_scored(g.owner, i, goals, events, world)
         break
-  # advance animations
-  for _, animation_list in animations.items():
-    for (i, a) in enumerate(animation_list):
-      a.age += 1
-      if a.age > a.duration:
-        animation_list.pop(i)
 
 
-def goal_scored(player, goal_index, goals, animations, world):
-  player.score += 1
-  g = goals[goal_index]
-  goals[goal_index] = Goal(world.random_position())
-  animations["score"].append(ScoreAnimation(g.position, player.color))
+# Broad phase for the collision pass: all physicals sorted into a uniform
+# grid on the torus, with cells wider than the largest collision distance,
+# so that colliding physicals are always in neighbouring cells. A physical
+# pushed by a collision has to be moved to its new cell (update) before
+# the next candidates are looked up.
+class CollisionGrid:
+  def __init__(self, physicals, world):
+    max_dist = 2 * max(Seeker.radius, Goal.radius)
+    self.nx = max(1, int(world.width // (2*max_dist)))
+    self.ny = max(1, int(world.height // (2*max_dist)))
+    self.cell_width = world.width / self.nx
+    self.cell_height = world.height / self.ny
+    self.physicals = physicals
+    self.cells = [self.cell(p.position) for p in physicals]
+    self.grid = {}
+    for i,c in enumerate(self.cells):
+      self.grid.setdefault(c, []).append(i)
+
+  def cell(self, pos):
+    return ( int(pos.x // self.cell_width) % self.nx
+           , int(pos.y // self.cell_height) % self.ny )
+
+  def candidates(self, i, after):
+    # the physicals j > after in cells next to i's, in order
+    grid = self.grid
+    found = []
+    for c in neighbour_cells(self.cells[i], self.nx, self.ny):
+      cell = grid.get(c)
+      if cell:
+        found += cell
+    return sorted(j for j in found if j > after)
 
+  def update(self, i):
+    # moves physical i to its current cell; whether that is a new one
+    c = self.cell(self.physicals[i].position)
+    if c == self.cells[i]:
+      return False
+    self.grid[self.cells[i]].remove(i)
+    self.grid.setdefault(c, []).append(i)
+    self.cells[i] = c
+    return True
 
 
+@functools.lru_cache(maxsize=4096)
+def neighbour_cells(cell, nx, ny):
+  # the cells around cell (and itself), each once also in small grids
+  cx, cy = cell
+  return tuple({ ((cx+dx) % nx, (cy+dy) % ny)
+                 for dx in (-1,0,1) for dy in (-1,0,1) })
+
+
+def goal_scored(player, goal_index, goals, events, world):
+  player.score += 1
+  g = goals[goal_index]
+  goals[goal_index] = Goal(world.random_position())
+  if events is not None:
+    events.emit(ev.GOAL_SCORED, player, g, g.position)
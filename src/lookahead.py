@@ -0,0 +1,162 @@
+from seekers_types import *
+import game_logic
+
+
+# Simulating a few ticks ahead, for ais: where will that goal drift, who
+# gets there first?
+#
+#   import lookahead
+#
+#   def decide(seekers, other_seekers, all_seekers, goals, other_players, own_camp, camps, world):
+#     now = lookahead.state(all_seekers, goals, camps, world)
+#     later = lookahead.simulate(now, {all_seekers.index(s): (x, y, 1)}, 20)
+#     later.goal_position(0)
+#
+# A State keeps the game in tuples of numbers, which are never changed:
+# cloning one only copies the references, and changing one (with_orders)
+# replaces just the tuples it touches, so states share everything else.
+# simulate(state, orders, n_ticks) runs game_logic.tick itself, on
+# seekers and goals it keeps for states of the same shape, and returns
+# the state after n_ticks.
+#
+# The seekers are those of all_seekers, in that order (which is the order
+# the game moves them in). Goals that are scored in a simulation respawn at
+# positions drawn from a generator seeded with respawn_seed, the real ones
+# will be somewhere else.
+# checks.py compares simulate with the game and times it.
+
+respawn_seed = 0
+
+class State:
+  # seekers: per seeker (x, y, velocity x, velocity y, target x, target y,
+  #          magnet strength, disabled counter)
+  # goals:   per goal (x, y, velocity x, velocity y, owner, owned for),
+  #          the owner being the index of its camp, or None
+  # scores:  goals scored during simulations, per camp
+  # camps:   per camp (x, y, width, height)
+  __slots__ = ("seekers", "goals", "scores", "camps", "width", "height", "tick")
+
+  def __init__(self, seekers, goals, scores, camps, width, height, tick=0):
+    self.seekers = seekers
+    self.goals = goals
+    self.scores = scores
+    self.camps = camps
+    self.width = width
+    self.height = height
+    # ticks simulated since the state was taken from the game
+    self.tick = tick
+
+  def clone(self):
+    return State( self.seekers, self.goals, self.scores, self.camps
+                , self.width, self.height, self.tick )
+
+  def with_orders(self, orders):
+    # a clone with the orders, see simulate
+    state = self.clone()
+    if orders:
+      seekers = list(self.seekers)
+      for i, (x, y, strength) in items(orders):
+        seekers[i] = seekers[i][:4] + (x, y, strength) + seekers[i][7:]
+      state.seekers = tuple(seekers)
+    return state
+
+  def seeker_position(self, i):
+    return Vector(*self.seekers[i][:2])
+
+  def goal_position(self, i):
+    return Vector(*self.goals[i][:2])
+
+def items(orders):
+  # (index, order) pairs of a dict or a sequence, without the Nones
+  pairs = orders.items() if isinstance(orders, dict) else enumerate(orders)
+  return [(i, order) for i, order in pairs if order is not None]
+
+def state(all_seekers, goals, camps, world):
+  # the state of the game as an ai gets it (or of the game's own objects)
+  owners = [c.owner for c in camps]
+  def owner(goal):
+    for i, o in enumerate(owners):
+      if o is goal.owner:
+        return i
+    return None
+  return State( tuple( ( s.position.x, s.position.y, s.velocity.x, s.velocity.y
+                       , s.target.x, s.target.y, s.magnet.strength, s.disabled_counter )
+                       for s in all_seekers )
+              , tuple( ( g.position.x, g.position.y, g.velocity.x, g.velocity.y
+                       , owner(g), g.owned_for )
+                       for g in goals )
+              , (0,) * len(camps)
+              , tuple( (c.position.x, c.position.y, c.width, c.height) for c in camps )
+              , world.width, world.height )
+
+def simulate(state, orders, n_ticks):
+  # the state after n_ticks, with the orders (target x, target y, magnet
+  # strength) given to the seekers first: a sequence with an order (or
+  # None, to keep the current one) for every seeker, or a dict by index
+  state = state.with_orders(orders)
+  simulation = simulation_for(state)
+  simulation.load(state)
+  for _ in range(n_ticks):
+    game_logic.tick( simulation.players, simulation.camps, simulation.goals
+                   , None, simulation.world )
+  return simulation.store(state.tick + n_ticks)
+
+# the objects simulate uses, by the shape of the states
+simulations = {}
+max_simulations = 8
+
+def simulation_for(state):
+  key = (len(state.seekers), len(state.goals), state.camps, state.width, state.height)
+  simulation = simulations.get(key)
+  if simulation is None:
+    if len(simulations) >= max_simulations:
+      simulations.clear()
+    simulation = Simulation(*key)
+    simulations[key] = simulation
+  return simulation
+
+class Simulation:
+  def __init__(self, num_seekers, num_goals, camps, width, height):
+    self.world = SeededWorld(width, height)
+    # game_logic.tick only needs the players for their seekers, and camps
+    # for the scores; so all seekers belong to the first one here, and
+    # every camp has its own owner
+    self.owners = [Player("camp " + str(i)) for i in range(len(camps))]
+    self.camps = [ Camp(o, Vector(x, y), w, h)
+                   for o, (x, y, w, h) in zip(self.owners, camps) ]
+    self.seekers = [Seeker(i, Vector(0, 0)) for i in range(num_seekers)]
+    self.players = [Player("seekers")]
+    self.players[0].seekers = self.seekers
+    self.goals = [Goal(Vector(0, 0)) for _ in range(num_goals)]
+
+  def load(self, state):
+    self.world.rng.seed(respawn_seed)
+    for o, score in zip(self.owners, state.scores):
+      o.score = score
+    for s, (x, y, vx, vy, tx, ty, strength, disabled) in zip(self.seekers, state.seekers):
+      s.position.x = x
+      s.position.y = y
+      s.velocity.x = vx
+      s.velocity.y = vy
+      s.target = Vector(tx, ty)
+      s.magnet.strength = strength
+      s.disabled_counter = disabled
+    for g, (x, y, vx, vy, owner, owned_for) in zip(self.goals, state.goals):
+      g.position.x = x
+      g.position.y = y
+      g.velocity.x = vx
+      g.velocity.y = vy
+      g.owner = None if owner is None else self.owners[owner]
+      g.owned_for = owned_for
+
+  def store(self, tick):
+    owners = {id(o): i for i, o in enumerate(self.owners)}
+    return State( tuple( ( s.position.x, s.position.y, s.velocity.x, s.velocity.y
+                         , s.target.x, s.target.y, s.magnet.strength, s.disabled_counter )
+                         for s in self.seekers )
+                , tuple( ( g.position.x, g.position.y, g.velocity.x, g.velocity.y
+                         , owners.get(id(g.owner)), g.owned_for )
+                         for g in self.goals )
+                , tuple(o.score for o in self.owners)
+                , tuple( (c.position.x, c.position.y, c.width, c.height) for c in self.camps )
+                , self.world.width, self.world.height, tick )
@@ -0,0 +1,99 @@
+from seekers_types import *
+
+import math
+import time
+
+
+# Policies that end a tournament match before its last tick, as soon as its
+# result is decided. They are given on the command line as
+#
+#   first-to:N      a player has scored N goals
+#   decided         nobody can catch up with the leader in the remaining
+#                   ticks any more, however fast they score
+#   time:SECONDS    the match has run for that many seconds
+#   confidence:P    extrapolating everybody's scoring rate so far, the
+#                   leader stays ahead with probability P (only checked
+#                   after min_fraction of the match)
+#
+# A match ends as soon as one of its policies says so; the winner is then
+# picked as usual, by engine.winner.
+
+class FirstTo:
+  def __init__(self, goals):
+    self.goals = goals
+
+  def decided(self, players, goals, tick, ticks):
+    return max(p.score for p in players) >= self.goals
+
+class DecidedLead:
+  def decided(self, players, goals, tick, ticks):
+    leader = players.index(max(players, key=lambda p: p.score))
+    remaining = ticks - tick
+    return all( players[leader].score > p.score + possible_goals(p, goals, remaining)
+                for i, p in enumerate(players) if i != leader )
+
+class TimeLimit:
+  def __init__(self, seconds):
+    self.seconds = seconds
+    self.start = time.monotonic()
+
+  def decided(self, players, goals, tick, ticks):
+    return time.monotonic() - self.start >= self.seconds
+
+class Confidence:
+  def __init__(self, probability, min_fraction=0.1):
+    self.probability = probability
+    self.min_fraction = min_fraction
+
+  def decided(self, players, goals, tick, ticks):
+    if tick < self.min_fraction * ticks:
+      return False
+    leader = max(players, key=lambda p: p.score)
+    remaining = ticks - tick
+    return all( leading_probability(leader.score, p.score, tick, remaining) >= self.probability
+                for p in players if p is not leader )
+
+def possible_goals(player, goals, remaining):
+  # an upper bound on the goals player can score in the remaining ticks:
+  # a goal is scored after scoring_time ticks in its owner's camp (fewer
+  # if player owns it already), and its replacement starts from scratch
+  total = 0
+  for g in goals:
+    first = Goal.scoring_time + 1
+    if g.owner is player:
+      first = max(1, Goal.scoring_time - g.owned_for)
+    if remaining >= first:
+      total += 1 + (remaining - first) // (Goal.scoring_time + 1)
+  return total
+
+def leading_probability(leader_score, score, tick, remaining):
+  # both keep scoring at their rate so far, as poisson processes; the
+  # normal approximation of the chance that the leader is still ahead.
+  # The rates count one goal more, so that a player who has not scored
+  # yet is not taken to never score.
+  leader_rate = (leader_score + 1) / tick
+  rate = (score + 1) / tick
+  lead = leader_score - score + (leader_rate - rate) * remaining
+  variance = (leader_rate + rate) * remaining
+  if variance == 0:
+    return 1.0 if lead > 0 else 0.0
+  return 0.5 * (1 + math.erf(lead / math.sqrt(2 * variance)))
+
+def parse(text):
+  name, _, argument = text.partition(":")
+  try:
+    if name == "first-to":
+      return FirstTo(int(argument))
+    if name == "decided" and not argument:
+      return DecidedLead()
+    if name == "time":
+      return TimeLimit(float(argument))
+    if name == "confidence":
+      return Confidence(float(argument))
+  except ValueError:
+    pass
+  raise ValueError("unknown match end policy: " + text)
+
+def decided(policies, players, goals, tick, ticks):
+  # whether the match can end after tick of ticks
+  return any(p.decided(players, goals, tick, ticks) for p in policies)
@@ -0,0 +1,115 @@
+from seekers_types import *
+import game_logic
+
+import numpy as np
+
+
+# Optional physics backend that computes the movement and the magnetic
+# forces of all seekers and goals in numpy arrays, in batched operations.
+# It is the array formulation of game_logic.tick that batched_worlds
+# builds on, not a faster engine for single matches: with the few dozen
+# physicals of a match, numpy's overhead per call and the copying between
+# objects and arrays cost more than the Python loops (compare
+# benchmark.py run with and without --numpy).
+#
+# The Seeker and Goal objects stay the interface for everything else:
+# every tick their state is read into arrays, and afterwards the new state
+# is written back into the objects. The collision pass depends on the
+# order of the pairs (earlier collisions push physicals around), so it is
+# game_logic's, on the objects.
+#
+# ArrayPhysics().tick has the same signature as game_logic.tick.
+# checks.py compares trajectories with the object based engine.
+
+class ArrayPhysics:
+  def tick(self, players, camps, goals, events, world):
+    seekers = [s for p in players for s in p.seekers]
+    self.load(seekers, goals)
+    self.move_seekers(world)
+    self.move_goals(world)
+    store(seekers, self.seeker_arrays)
+    for s,counter in zip(seekers, self.disabled_counters.tolist()):
+      s.disabled_counter = counter
+    store(goals, self.goal_arrays)
+    game_logic.handle_collisions(seekers + goals, world, events)
+    game_logic.score_goals(camps, goals, events, world)
+    if events is not None:
+      events.tick += 1
+
+  def load(self, seekers, goals):
+    # anything might have been changed by anyone since the last tick
+    self.seeker_arrays = load(seekers)
+    self.goal_arrays = load(goals)
+    self.targets = np.array([(s.target.x, s.target.y) for s in seekers], dtype=float).reshape(-1,2)
+    self.magnets = np.array([s.magnet.strength for s in seekers], dtype=float)
+    self.disabled_counters = np.array([s.disabled_counter for s in seekers], dtype=int)
+
+  def move_seekers(self, world):
+    p, v, a = self.seeker_arrays
+    v *= 1 - Seeker.friction
+    d = torus_difference(world, p, self.targets)
+    active = self.disabled_counters == 0
+    a[:] = np.where(active[:,None], normalized(d), 0)
+    thrust = Seeker.base_thrust * np.where(self.magnets != 0, Seeker.magnet_slowdown, 1)
+    v += a * thrust[:,None]
+    p += v
+    normalize_positions(world, p)
+    self.disabled_counters -= self.disabled_counters > 0
+
+  def move_goals(self, world):
+    sp = self.seeker_arrays[0]
+    p, v, a = self.goal_arrays
+    # all seeker-goal pairs at once, seekers along the first axis
+    left = sp[:,None,:]
+    right = p[None,:,:]
+    r = torus_distance(world, left, right) / world.diameter()
+    d = normalized(torus_difference(world, left, right))
+    strength = np.where(self.disabled_counters > 0, 0, self.magnets)
+    a[:] = (- d * (strength[:,None] * bump(r*10))[:,:,None]).sum(axis=0)
+    v *= 1 - Goal.friction
+    v += a * Goal.base_thrust
+    p += v
+    normalize_positions(world, p)
+
+
+def load(objects):
+  # positions, velocities and accelerations, of shape (len(objects), 2)
+  return tuple( np.array([(v.x, v.y) for v in vectors], dtype=float).reshape(-1,2)
+                for vectors in ( [o.position for o in objects]
+                               , [o.velocity for o in objects]
+                               , [o.acceleration for o in objects] ) )
+
+def store(objects, arrays):
+  p, v, a = (x.tolist() for x in arrays)
+  for o,pi,vi,ai in zip(objects, p, v, a):
+    o.position.x, o.position.y = pi
+    o.velocity.x, o.velocity.y = vi
+    o.acceleration = Vector(*ai)
+
+
+# batched versions of the World methods, for arrays of shape (...,2)
+
+def normalize_positions(world, p):
+  size = np.array([world.width, world.height], dtype=float)
+  p -= np.floor(p / size) * size
+
+def torus_distance(world, left, right):
+  size = np.array([world.width, world.height], dtype=float)
+  delta = np.abs(right - left)
+  d = np.minimum(delta, size - delta)
+  return np.sqrt(d[...,0]*d[...,0] + d[...,1]*d[...,1])
+
+def torus_difference(world, left, right):
+  size = np.array([world.width, world.height], dtype=float)
+  delta = np.abs(left - right)
+  return np.where(delta < size - delta, right - left, left - right)
+
+def normalized(d):
+  norm = np.sqrt(d[...,0]*d[...,0] + d[...,1]*d[...,1])[...,None]
+  safe = np.where(norm == 0, 1, norm)
+  return np.where(norm == 0, 0, d / safe)
+
+def bump(r):
+  inside = r < 1
+  safe = np.where(inside, r, 0)
+  return np.where(inside, np.exp(1 / (safe**2 - 1)), 0)
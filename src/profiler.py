@@ -0,0 +1,99 @@
+import utils
+
+import os
+import json
+import time
+import collections
+
+
+# Where the time of a frame goes: the phases of game_logic.tick, the
+# snapshot for the ais, every player's ai, and the stages of draw.draw.
+#
+# The functions that have phases take an optional profile (a Profiler, or
+# None when profiling is off, which is all they check then) and call
+# profile.lap(name) after every phase: the time since the previous lap (or
+# since profile.start()) is added to the phase's last window durations, of
+# which the percentiles are reported. Durations measured elsewhere, like
+# the ais' thinking times in their worker processes, are added with
+# profile.add.
+#
+# seekers.py --profile FILE writes the percentiles to FILE (as json, see
+# Profiler.write) every export_interval seconds and at the end, and shows
+# them in debug mode next to the frame rate.
+
+export_interval = 5.0  # seconds
+overlay_interval = 0.5  # seconds
+
+class Profiler:
+  def __init__(self, window=500):
+    self.window = window
+    # durations in seconds by phase, in the order the phases first occurred
+    self.durations = collections.OrderedDict()
+    self.last = time.perf_counter()
+    self.lines = []
+    self.lines_time = None
+
+  def start(self):
+    self.last = time.perf_counter()
+
+  def lap(self, name):
+    now = time.perf_counter()
+    self.add(name, now - self.last)
+    self.last = now
+
+  def add(self, name, seconds):
+    durations = self.durations.get(name)
+    if durations is None:
+      durations = collections.deque(maxlen=self.window)
+      self.durations[name] = durations
+    durations.append(seconds)
+
+  def statistics(self):
+    # the percentiles of every phase, in milliseconds
+    return collections.OrderedDict( (name, statistics(durations))
+                                    for name, durations in self.durations.items() )
+
+  def write(self, filename):
+    data = { "time": time.strftime("%Y-%m-%d %H:%M:%S")
+           , "window": self.window
+           , "phases": self.statistics() }
+    # written to a temporary file first, so that readers never see half of it
+    temporary = filename + ".tmp"
+    with open(temporary, "w") as f:
+      json.dump(data, f, indent=2)
+    os.replace(temporary, filename)
+
+  def overlay_lines(self):
+    # one line per phase, recomputed every overlay_interval seconds only,
+    # so that the numbers can be read (and their images cached)
+    now = time.monotonic()
+    if self.lines_time is None or now - self.lines_time >= overlay_interval:
+      self.lines_time = now
+      self.lines = [ "%-18s %6.2f %6.2f %6.2f" % (name[:18], s["p50_ms"], s["p90_ms"], s["p99_ms"])
+                     for name, s in self.statistics().items() ]
+      if self.lines:
+        self.lines.insert(0, "%-18s %6s %6s %6s" % ("ms", "p50", "p90", "p99"))
+    return self.lines
+
+class Exporter:
+  # writes a profiler's statistics to a file every export_interval seconds
+  def __init__(self, profile, filename):
+    self.profile = profile
+    self.filename = filename
+    self.last = time.monotonic()
+
+  def update(self):
+    if time.monotonic() - self.last >= export_interval:
+      self.write()
+
+  def write(self):
+    self.profile.write(self.filename)
+    self.last = time.monotonic()
+
+def statistics(durations):
+  p50, p90, p99 = utils.percentiles(durations, (0.5, 0.9, 0.99))
+  return { "count": len(durations)
+         , "mean_ms": sum(durations) / len(durations) * 1e3
+         , "p50_ms": p50 * 1e3
+         , "p90_ms": p90 * 1e3
+         , "p99_ms": p99 * 1e3 }
@@ -0,0 +1,33 @@
+# Elo ratings for matches of any number of players. A match counts as one
+# game between every pair of its players, won by the one with more goals,
+# and the changes are scaled so that one match moves a rating by at most
+# k_factor. Ratings are updated match by match, without looking at older
+# matches.
+
+initial_rating = 1500.0
+k_factor = 32.0
+
+def expected_score(rating, other):
+  # the chance to win against other, between 0 and 1
+  return 1 / (1 + 10 ** ((other - rating) / 400))
+
+def actual_score(score, other):
+  if score > other:
+    return 1.0
+  if score == other:
+    return 0.5
+  return 0.0
+
+def rating_changes(ratings, scores, k=k_factor):
+  # the change of every player's rating by a match with the given scores
+  n = len(ratings)
+  if n < 2:
+    return [0.0] * n
+  changes = []
+  for i in range(n):
+    change = 0.0
+    for j in range(n):
+      if i != j:
+        change += actual_score(scores[i], scores[j]) - expected_score(ratings[i], ratings[j])
+    changes.append(k * change / (n - 1))
+  return changes
@@ -0,0 +1,179 @@
+from seekers_types import *
+
+import json
+import mmap
+import struct
+import hashlib
+
+
+# Replay files: a json header with everything that stays the same during a
+# match (seed, world size, players, their ais' file hashes), followed by one
+# fixed size binary frame per tick. Frames can therefore be read directly
+# from a memory map, without reading the whole file.
+#
+# A frame contains for every seeker: position, velocity, acceleration,
+# magnet strength and disabled counter; for every goal: position, velocity,
+# uid, owner and owned_for; and every player's score.
+
+magic = b"SEEKERS-REPLAY-1\n"
+length_format = struct.Struct("<I")
+seeker_format = "6fbH"
+goal_format = "4fibH"
+
+def frame_format(num_seekers, num_goals, num_players):
+  return struct.Struct( "<" + seeker_format*sum(num_seekers)
+                      + goal_format*num_goals + "i"*num_players )
+
+def file_hash(filename):
+  with open(filename, "rb") as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+def header_data(players, goals, world, seed):
+  # magic, length and json header, as at the start of a replay file
+  header = { "seed": seed
+           , "width": world.width
+           , "height": world.height
+           , "num_goals": len(goals)
+           , "players": [ { "name": p.name
+                          , "color": list(p.color)
+                          , "filename": p.ai.filename
+                          , "sha256": file_hash(p.ai.filename)
+                          , "is_dummy": p.ai.is_dummy
+                          , "num_seekers": len(p.seekers) }
+                          for p in players ] }
+  data = json.dumps(header).encode()
+  return magic + length_format.pack(len(data)) + data
+
+def frame_values(players, goals):
+  index = {id(p): i for i,p in enumerate(players)}
+  values = []
+  for p in players:
+    for s in p.seekers:
+      values += [ s.position.x, s.position.y
+                , s.velocity.x, s.velocity.y
+                , s.acceleration.x, s.acceleration.y
+                , s.magnet.strength, s.disabled_counter ]
+  for g in goals:
+    values += [ g.position.x, g.position.y
+              , g.velocity.x, g.velocity.y
+              , g.uid, index.get(id(g.owner), -1), g.owned_for ]
+  values += [p.score for p in players]
+  return values
+
+def view(header):
+  # players, camps and goals to be updated with show()
+  world = World(header["width"], header["height"])
+  players = []
+  for h in header["players"]:
+    p = Player(h["name"])
+    p.color = h["color"]
+    p.ai = ReplayedAi(h["filename"], h["is_dummy"])
+    p.seekers = [Seeker(i, Vector(0, 0)) for i in range(h["num_seekers"])]
+    players.append(p)
+  goals = [Goal(Vector(0, 0)) for _ in range(header["num_goals"])]
+  return players, world.generate_camps(players), goals
+
+def show(frame, players, goals):
+  # sets the players, seekers and goals to the values of a frame
+  values = iter(frame)
+  for p in players:
+    for s in p.seekers:
+      s.position = Vector(next(values), next(values))
+      s.velocity = Vector(next(values), next(values))
+      s.acceleration = Vector(next(values), next(values))
+      s.magnet.strength = next(values)
+      s.disabled_counter = next(values)
+  for g in goals:
+    g.position = Vector(next(values), next(values))
+    g.velocity = Vector(next(values), next(values))
+    g.uid = next(values)
+    owner = next(values)
+    g.owner = players[owner] if owner >= 0 else None
+    g.owned_for = next(values)
+  for p in players:
+    p.score = next(values)
+
+def goal_uids_and_owners(frame, num_seekers, num_goals):
+  start = 8*sum(num_seekers)
+  uids = frame[start+4 : start+7*num_goals : 7]
+  owners = frame[start+5 : start+7*num_goals : 7]
+  positions = [ Vector(frame[start+7*i], frame[start+7*i+1])
+                for i in range(num_goals) ]
+  return uids, owners, positions
+
+def scored_goals(before, after):
+  # the (position, owner) of every goal that was scored between two frames'
+  # goal_uids_and_owners; a scored goal is replaced by one with a new uid
+  return [ (position, owner)
+           for old_uid, new_uid, owner, position in zip(before[0], after[0], before[1], before[2])
+           if old_uid != new_uid and owner >= 0 ]
+
+
+class Recorder:
+  def __init__(self, filename, players, goals, world, seed):
+    self.format = frame_format( [len(p.seekers) for p in players]
+                              , len(goals), len(players) )
+    self.file = open(filename, "wb")
+    self.file.write(header_data(players, goals, world, seed))
+
+  def record(self, players, goals):
+    self.file.write(self.format.pack(*frame_values(players, goals)))
+
+  def close(self):
+    self.file.close()
+
+
+class Replay:
+  def __init__(self, filename):
+    self.file = open(filename, "rb")
+    self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    if self.data[:len(magic)] != magic:
+      raise ValueError(filename + " is not a seekers replay")
+    (length,) = length_format.unpack_from(self.data, len(magic))
+    start = len(magic) + length_format.size
+    self.header = json.loads(self.data[start:start+length].decode())
+    self.frames_start = start + length
+    self.num_seekers = [p["num_seekers"] for p in self.header["players"]]
+    self.num_goals = self.header["num_goals"]
+    self.format = frame_format( self.num_seekers, self.num_goals
+                              , len(self.num_seekers) )
+    self.num_frames = (len(self.data) - self.frames_start) // self.format.size
+    self.world = World(self.header["width"], self.header["height"])
+
+  def frame(self, t):
+    return self.format.unpack_from(self.data, self.frames_start + t*self.format.size)
+
+  def view(self):
+    return view(self.header)
+
+  def show(self, t, players, goals):
+    show(self.frame(t), players, goals)
+
+  def goal_uids_and_owners(self, t):
+    return goal_uids_and_owners(self.frame(t), self.num_seekers, self.num_goals)
+
+  def animations(self, t, players):
+    # a goal whose uid changed was scored; rebuild the score animations
+    # that would still be running at frame t
+    animations = []
+    first = max(1, t - ScoreAnimation.duration + 1)
+    if t < first:
+      return animations
+    before = self.goal_uids_and_owners(first - 1)
+    for k in range(first, t+1):
+      after = self.goal_uids_and_owners(k)
+      for position, owner in scored_goals(before, after):
+        a = ScoreAnimation(position, players[owner].color)
+        a.age = t - k + 1
+        animations.append(a)
+      before = after
+    return animations
+
+  def close(self):
+    self.data.close()
+    self.file.close()
+
+class ReplayedAi:
+  def __init__(self, filename, is_dummy):
+    self.filename = filename
+    self.is_dummy = is_dummy
@@ -0,0 +1,63 @@
+from seekers_types import *
+import replay
+import engine
+import draw
+
+import sys
+
+import pygame
+
+
+# Shows a recorded match without running physics or ais.
+# Usage: python3 src/replay_viewer.py REPLAY_FILE
+#
+# space: pause, left/right: jump 10 seconds of game time,
+# up/down: double/halve the speed, home/end: jump to start/end
+
+def main():
+  if len(sys.argv) != 2:
+    print("usage: " + sys.argv[0] + " REPLAY_FILE", file=sys.stderr)
+    sys.exit(1)
+  recording = replay.Replay(sys.argv[1])
+  world = recording.world
+  players, camps, goals = recording.view()
+
+  pygame.init()
+  pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN])
+  screen = pygame.display.set_mode((world.width, world.height))
+  clock = pygame.time.Clock()
+  draw.init(players)
+
+  last = recording.num_frames - 1
+  jump = 10 * 50 * engine.speedup_factor
+  speed = engine.speedup_factor
+  paused = False
+  t = 0
+  quit = False
+  while not quit and last >= 0:
+    for e in pygame.event.get():
+      if e.type == pygame.QUIT:
+        quit = True
+      elif e.type == pygame.KEYDOWN:
+        if e.key == pygame.K_SPACE: paused = not paused
+        elif e.key == pygame.K_RIGHT: t += jump
+        elif e.key == pygame.K_LEFT: t -= jump
+        elif e.key == pygame.K_UP: speed *= 2
+        elif e.key == pygame.K_DOWN: speed = max(1, speed // 2)
+        elif e.key == pygame.K_HOME: t = 0
+        elif e.key == pygame.K_END: t = last
+    t = min(max(t, 0), last)
+
+    recording.show(t, players, goals)
+    animations = recording.animations(t, players)
+    draw.draw(players, camps, goals, animations, clock, world, screen)
+    clock.tick(50)
+
+    if not paused:
+      t = min(t + speed, last)
+
+  recording.close()
+
+
+if __name__ == "__main__":
+  main()
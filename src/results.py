@@ -0,0 +1,120 @@
+import rating
+
+import time
+import sqlite3
+import argparse
+
+
+# Stores the results of matches in an sqlite database, and the bots'
+# ratings, which are updated with every recorded match.
+#
+#   python3 src/results.py FILE [--limit N]     prints the leaderboard
+#
+# A bot is identified by the sha256 hash of its file, so a changed bot
+# is a new bot with a new rating. Every match is stored with its seed,
+# duration and, per player, the bot, its score and its rating after the
+# match.
+
+schema = """
+create table if not exists bots
+  ( id integer primary key
+  , sha256 text not null unique
+  , filename text not null
+  , rating real not null
+  , matches integer not null default 0
+  , wins integer not null default 0 );
+create index if not exists bots_by_rating on bots (rating desc);
+
+create table if not exists matches
+  ( id integer primary key
+  , seed integer not null
+  , finished text not null
+  , duration real not null
+  , winner integer not null references bots (id) );
+
+create table if not exists participants
+  ( match integer not null references matches (id)
+  , position integer not null
+  , bot integer not null references bots (id)
+  , score integer not null
+  , rating real not null
+  , primary key (match, position) );
+create index if not exists participants_by_bot on participants (bot, match);
+"""
+
+class ResultsStore:
+  def __init__(self, filename):
+    # waits for other processes writing to the same file
+    self.connection = sqlite3.connect(filename, timeout=60)
+    self.connection.executescript(schema)
+
+  def bot(self, sha256, filename):
+    # the id and rating of a bot, which is added if it is new
+    row = self.connection.execute(
+      "select id, rating from bots where sha256 = ?", (sha256,)).fetchone()
+    if row is not None:
+      self.connection.execute(
+        "update bots set filename = ? where id = ?", (filename, row[0]))
+      return row
+    cursor = self.connection.execute(
+      "insert into bots (sha256, filename, rating) values (?, ?, ?)",
+      (sha256, filename, rating.initial_rating))
+    return cursor.lastrowid, rating.initial_rating
+
+  def record(self, seed, filenames, hashes, scores, winner, duration):
+    # winner is the position of the winning bot; returns the match's id
+    with self.connection:
+      # lock before reading the ratings, other processes may record as well
+      self.connection.execute("begin immediate")
+      bots = [self.bot(h, f) for f, h in zip(filenames, hashes)]
+      changes = rating.rating_changes([r for _, r in bots], scores)
+      # a bot playing several positions gets the changes of all of them
+      ratings = dict(bots)
+      for (bot, _), change in zip(bots, changes):
+        ratings[bot] += change
+      cursor = self.connection.execute(
+        "insert into matches (seed, finished, duration, winner) values (?, ?, ?, ?)",
+        (seed, time.strftime("%Y-%m-%d %H:%M:%S"), duration, bots[winner][0]))
+      match = cursor.lastrowid
+      self.connection.executemany(
+        "insert into participants (match, position, bot, score, rating) values (?, ?, ?, ?, ?)",
+        [ (match, position, bot, score, ratings[bot])
+          for position, ((bot, _), score) in enumerate(zip(bots, scores)) ])
+      for bot, new in ratings.items():
+        self.connection.execute(
+          "update bots set rating = ?, matches = matches + 1, wins = wins + ? where id = ?",
+          (new, int(bot == bots[winner][0]), bot))
+    return match
+
+  def leaderboard(self, limit=None):
+    # (filename, sha256, rating, matches, wins) of the best rated bots
+    return self.connection.execute(
+      "select filename, sha256, rating, matches, wins from bots"
+      " order by rating desc limit ?",
+      (-1 if limit is None else limit,)).fetchall()
+
+  def history(self, sha256):
+    # (match id, seed, score, rating after the match) of a bot's matches
+    return self.connection.execute(
+      "select p.match, m.seed, p.score, p.rating"
+      " from bots b join participants p on p.bot = b.id join matches m on m.id = p.match"
+      " where b.sha256 = ? order by p.match", (sha256,)).fetchall()
+
+  def close(self):
+    self.connection.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description="show the leaderboard")
+  parser.add_argument("database")
+  parser.add_argument("--limit", type=int, default=None)
+  args = parser.parse_args()
+  store = ResultsStore(args.database)
+  for i, (filename, sha256, r, matches, wins) in enumerate(store.leaderboard(args.limit)):
+    print("%3d  %7.1f  %5d matches  %5d wins  %s (%s)"
+          % (i+1, r, matches, wins, filename, sha256[:8]))
+  store.close()
+
+
+if __name__ == "__main__":
+  main()
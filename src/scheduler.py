@@ -0,0 +1,99 @@
+import time
+
+
+# Decides when the game loop runs ticks and when it draws, so that the
+# simulation runs at its own rate, independent of the frame rate:
+#
+#   while ...:
+#     while scheduler.tick_due():
+#       ... one tick ...
+#     scheduler.wait_for_frame()
+#     ... draw ...
+#
+# With a tick rate, the ticks follow the clock (times speed); when the
+# simulation falls behind, it catches up by running several ticks per
+# frame, i.e. frames are dropped. It never catches up on more than
+# max_lag seconds, and spends at most a frame interval on ticks between
+# two frames, so a machine that is too slow just runs slower.
+# Without a tick rate (unbounded), ticks run until the next frame is due,
+# but for at least half a frame interval.
+
+class Scheduler:
+  def __init__(self, tick_rate, frame_rate, max_lag=0.25):
+    # tick_rate in ticks per second, or None for unbounded
+    self.tick_rate = tick_rate
+    self.frame_interval = 1 / frame_rate
+    self.max_lag = max_lag
+    self.speed = 1.0
+    self.paused = False
+    self.unbounded = tick_rate is None
+    self.steps = 0
+    now = time.monotonic()
+    self.tick_time = now
+    self.ticks_start = now
+    self.next_frame = now + self.frame_interval
+    self.ticks_this_frame = 0
+
+  def tick_due(self):
+    # whether to run another tick before drawing; counts the tick if so
+    if self.paused:
+      if self.steps > 0:
+        self.steps -= 1
+        return True
+      return False
+    now = time.monotonic()
+    if self.ticks_this_frame == 0:
+      self.ticks_start = now
+    ticking = now - self.ticks_start
+    if self.unbounded:
+      if now >= self.next_frame and ticking >= self.frame_interval / 2:
+        return False
+    else:
+      if ticking > self.frame_interval:
+        return False
+      self.tick_time = max(self.tick_time, now - self.max_lag)
+      if self.tick_time > now:
+        return False
+      self.tick_time += 1 / (self.tick_rate * self.speed)
+    self.ticks_this_frame += 1
+    return True
+
+  def wait_for_frame(self):
+    now = time.monotonic()
+    if now < self.next_frame:
+      time.sleep(self.next_frame - now)
+      now = self.next_frame
+    # a late frame starts the next interval, the missed frames are dropped
+    self.next_frame = max(self.next_frame, now) + self.frame_interval
+    self.ticks_this_frame = 0
+
+  def toggle_pause(self):
+    self.paused = not self.paused
+    self.steps = 0
+    self.restart()
+
+  def step(self):
+    # runs a single tick; pauses first if the game was running
+    if not self.paused:
+      self.toggle_pause()
+    self.steps += 1
+
+  def toggle_unbounded(self):
+    if self.tick_rate is not None:
+      self.unbounded = not self.unbounded
+      self.restart()
+
+  def change_speed(self, factor):
+    self.speed *= factor
+    self.restart()
+
+  def restart(self):
+    # forget how far behind the clock the simulation is
+    self.tick_time = time.monotonic()
+
+  def description(self):
+    if self.paused:
+      return "paused"
+    if self.unbounded:
+      return "unbounded"
+    return "%g ticks/s" % (self.tick_rate * self.speed)
@@ -1,22 +1,20 @@
 from seekers_types import *
 import game_logic
-import utils
+import engine
+import replay
 import draw
+import scheduler
+import broadcast
+import match_end
+import profiler
+import events as ev
 
 import sys
-import os
-import os.path
-import glob
-import imp
-import traceback
+import argparse
 
 import pygame
-import sys
-import copy
-import random
 
 
-speedup_factor = 7
 screen = None
 quit = False
 clock = None
@@ -25,11 +23,16 @@ world = World(768, 768)
 goals = []
 players = []
 camps = []
-animations = {"score": []}
+# what happens during the ticks, drained once per frame into the animations
+events = ev.EventStream()
+animations = ev.ScoreAnimations()
 tournament_mode = False
-
-num_goals = 6
-num_seekers = 5
+recorder = None
+broadcaster = None
+timing = None
+end_policies = []
+profile = None
+exporter = None
 
 def start():
   global screen
@@ -39,99 +42,86 @@ def start():
   global goals
   global players
   global camps
+  global tournament_mode
+  global recorder
+  global broadcaster
+  global timing
+  global end_policies
+  global profile
+  global exporter
+
+  parser = argparse.ArgumentParser(description="seekers")
+  parser.add_argument("bots", nargs="*",
+      help="ai files playing a tournament match (default: all ai*.py files)")
+  parser.add_argument("--record", metavar="FILE", help="record a replay")
+  parser.add_argument("--end", metavar="POLICY", type=match_end.parse, action="append",
+      default=[], help="end a tournament match early (see match_end.py)")
+  parser.add_argument("--spectators", metavar="ADDRESS",
+      help="stream the match to spectator.py at host:port or a unix socket path")
+  parser.add_argument("--dirty-rects", action="store_true",
+      help="only update the changed parts of the screen (for remote displays)")
+  parser.add_argument("--tick-rate", type=float, default=50*engine.speedup_factor,
+      help="game ticks per second, 0 for as fast as possible (default: %(default)s)")
+  parser.add_argument("--fps", type=float, default=50,
+      help="frames per second (default: %(default)s)")
+  parser.add_argument("--ai-time-limit", type=float, default=engine.ai_time_limit,
+      help="seconds an ai may think per tick, late ais keep their orders"
+           " (default: %(default)s)")
+  parser.add_argument("--poll-ais", action="store_true",
+      help="look for changed ai files by polling instead of inotify"
+           " (network shares are always polled)")
+  parser.add_argument("--debug", action="store_true",
+      help="start in debug mode (toggled with d)")
+  parser.add_argument("--profile", metavar="FILE",
+      help="time the phases of every tick and frame, and write their percentiles to FILE")
+  args = parser.parse_args()
 
   pygame.init()
-  pygame.event.set_allowed([pygame.QUIT])
+  pygame.event.set_allowed([pygame.QUIT, pygame.WINDOWEXPOSED, pygame.KEYDOWN])
   dimensions = (world.width,world.height)
   screen = pygame.display.set_mode( dimensions )
   clock = pygame.time.Clock()
-  random.seed(42)
-
-  # initialize goals
-  goals = [Goal(world.random_position()) for _ in range(0, num_goals)]
-
-  # find ais and initialize players
-  players = []
-  load_players()
-  reset()
-
-  # set up camps
-  camps = world.generate_camps(players)
-
-  # prepare graphics
-  draw.init(players)
-
-  quit = False
-  main_loop()
-
-def load_players():
-  global players
-  global tournament_mode
-
-  if len(sys.argv) <= 1:
-    for search_path in ("", "./src/ais/"):
-      for filename in glob.glob(search_path + "ai*.py"):
-        load_player(filename)
+  timing = scheduler.Scheduler(args.tick_rate or None, args.fps)
+  end_policies = args.end
+  world.debug_mode = args.debug
+  engine.reload_polling = args.poll_ais
+  engine.ai_time_limit = args.ai_time_limit
+  if args.profile:
+    profile = profiler.Profiler()
+    exporter = profiler.Exporter(profile, args.profile)
+
+  # find ais and initialize players, goals and camps
+  if not args.bots:
+    filenames = engine.find_ai_files()
   else:
-    for filename in sys.argv[1:]:
-      load_player(filename)
+    filenames = args.bots
     tournament_mode = True
+  seed = 42
+  players, camps, goals = engine.setup_match(filenames, world, seed)
+  if args.record:
+    recorder = replay.Recorder(args.record, players, goals, world, seed)
+  if args.spectators:
+    broadcaster = broadcast.Broadcaster(args.spectators, players, goals, world, seed)
 
-def load_player(filename):
-  name = filename[:-3]
-  p    = Player(name)
-  p.ai = load_ai(filename)
-  players.append(p)
-
-def load_ai(filename):
-  def dummy_decide(mySeekers, other_seekers, all_seekers, goals, otherPlayers, own_camp, camps, world):
-    for s in mySeekers:
-      s.target = s.position
-    return mySeekers
-
-  def indent(lines):
-    return utils.fmap(lambda l: " "+l,lines)
-
-  def mogrify(code):
-    if code.startswith("#bot"):
-      prelude = []
-      lines = code.split("\n")
-      seekerdef = ["def decide(seekers, other_seekers, all_seekers, goals, otherPlayers, own_camp, camps, world):"]
-      seekerret = ["return seekers"]
-      lines = seekerdef + indent(prelude + lines[1:] + seekerret)
-      return "\n".join(lines)
-    else:
-      return code
+  # prepare graphics
+  draw.init(players, args.dirty_rects)
+  events.subscribe(animations)
 
+  quit = False
+  watcher = engine.watch_ais(players)
   try:
-    with open(filename, "r") as f:
-      code = mogrify(f.read())
-      mod  = imp.new_module(filename[:-3])
-      mod_dict = mod.__dict__
-      exec(code, mod_dict)
-      ai = mod.decide
-      ai.is_dummy = False
-  except Exception:
-    print("**********************************************************", file=sys.stderr)
-    traceback.print_exc(file=sys.stderr)
-    print("", file=sys.stderr)
-
-    ai = dummy_decide
-    ai.is_dummy = True
-
-  ai.filename  = filename
-  ai.timestamp = os.path.getctime(filename)
-
-  return ai
-
-def reset():
-  global players
-
-  for p in players:
-    p.seekers = [Seeker(i,world.random_position()) for i in range(0, num_seekers)]
-
-def main_loop():
-  global speedup_factor
+    main_loop(watcher)
+  finally:
+    watcher.close()
+    engine.close_ais(players)
+    if recorder is not None:
+      recorder.close()
+    if broadcaster is not None:
+      broadcaster.close()
+    if exporter is not None:
+      exporter.write()
+
+def main_loop(watcher):
   global quit
   global players
   global camps
@@ -140,21 +130,31 @@ def main_loop():
   global animations
   global screen
 
-  step = 0
+  ticks = 0
+  last_tick = (engine.tournament_steps + 1) * engine.speedup_factor
 
   while not quit:
     handle_events()
-    for _ in range(speedup_factor):
-      call_ais()
-      game_logic.tick(players, camps, goals, animations, world)
-    draw.draw(players, camps, goals, animations, clock, world, screen)
-    clock.tick(50)  # 20ms relative to last tick
-
-    step += 1
-    if tournament_mode and step > 10000:
-      best_player = sorted(players, key=lambda p: p.score, reverse=True)[0]
-      print(best_player.ai.filename)
-      quit = True
+    engine.reload_changed_ais(players, watcher)
+    while timing.tick_due():
+      engine.call_ais(players, camps, goals, world, profile, engine.ai_time_limit)
+      game_logic.tick(players, camps, goals, events, world, profile)
+      if recorder is not None:
+        recorder.record(players, goals)
+      ticks += 1
+      if tournament_mode and (ticks >= last_tick or
+          match_end.decided(end_policies, players, goals, ticks, last_tick)):
+        print(engine.winner(players).ai.filename)
+        quit = True
+        break
+    events.drain()
+    if broadcaster is not None:
+      broadcaster.publish(ticks, players, goals)
+    timing.wait_for_frame()
+    draw.draw(players, camps, goals, animations.animations, clock, world, screen, profile)
+    clock.tick()  # only measures the frame rate
+    if exporter is not None:
+      exporter.update()
 
 def handle_events():
   for e in pygame.event.get():
@@ -164,82 +164,23 @@ def handle_event(e):
   if e.type == pygame.QUIT:
     global quit
     quit = True
-
-def call_ais():
-  global players
-  global camps
-  global world
-
-  for p,c in zip(players,camps):
-    if os.path.getctime(p.ai.filename) > p.ai.timestamp:
-      p.ai = load_ai(p.ai.filename)
-    call_ai(p, c)
-
-def call_ai(player, own_camp):
-  def warn_invalid_data():
-    print( "The AI of Player "
-         + player.name
-         + " returned invalid data" )
-  own_seekers, other_seekers, all_seekers, goals, other_players, camps, world = prepare_ai_input(player)
-  new_seekers = sandboxed_ai_call( player
-          , lambda: player.ai( own_seekers
-                             , other_seekers
-                             , all_seekers
-                             , goals
-                             , other_players
-                             , own_camp
-                             , camps
-                             , world ) )
-  if isinstance(new_seekers, list):
-    for new, original in zip(new_seekers, player.seekers):
-      if isinstance(new, Seeker):
-        status = Seeker.copy_alterables(new,original)
-        if not status: warn_invalid_data()
-      else: warn_invalid_data()
-  else: warn_invalid_data()
-
-def sandboxed_ai_call(player, ai_call):
-# block_stdio()
-  try:
-    res = ai_call()
-  except Exception as e:
-    restore_stdio()
-    print(  "The AI of Player "
-            + player.name
-            + " raised an exception:" )
-    traceback.print_exc(file=sys.stderr)
-    return []
-# restore_stdio()
-  return res
-
-class NullDevice():
-  def write(self,s): pass
-
-def block_stdio():
-  sys.stdout = NullDevice()
-  sys.stderr = NullDevice()
-
-def restore_stdio():
-  sys.stdout = sys.__stdout__
-  sys.stderr = sys.__stderr__
-
-def prepare_ai_input(player):
-  global players
-  global goals
-  global world
-  i = players.index(player)
-  all_players = copy.deepcopy(players)
-  all_seekers = list(utils.flatten([p.seekers for p in all_players]))
-  this_player, other_players = utils.pop_split(all_players,i)
-  other_seekers = list(utils.flatten([p.seekers for p in other_players]))
-  own_seekers = this_player.seekers
-  return ( own_seekers
-         , other_seekers
-         , all_seekers
-         , copy.deepcopy(goals)
-         , other_players
-         , copy.deepcopy(camps)
-         , copy.deepcopy(world) )
+  elif e.type == pygame.WINDOWEXPOSED:
+    draw.redraw_all()
+  elif e.type == pygame.KEYDOWN:
+    # space: pause, right: single tick, up/down: double/halve the speed,
+    # u: toggle running as fast as possible, d: toggle debug mode
+    if e.key == pygame.K_SPACE: timing.toggle_pause()
+    elif e.key == pygame.K_RIGHT: timing.step()
+    elif e.key == pygame.K_UP: timing.change_speed(2)
+    elif e.key == pygame.K_DOWN: timing.change_speed(1/2)
+    elif e.key == pygame.K_u: timing.toggle_unbounded()
+    elif e.key == pygame.K_d:
+      world.debug_mode = not world.debug_mode
+      draw.redraw_all()
+      return
+    else: return
+    # stdout only gets the winner of a tournament match
+    print(timing.description(), file=sys.stderr)
 
 
 start()
@@ -0,0 +1,77 @@
+from seekers_types import *
+import game_logic
+import engine
+import replay
+import results
+import match_end
+
+import time
+import argparse
+
+
+# Runs a tournament match without pygame, as fast as possible,
+# and prints the filename of the winning ai.
+# Usage: python3 src/seekers_headless.py [--record FILE] [--database FILE]
+#          [--end POLICY]... [--ai-time-limit SECONDS] bot1.py bot2.py ...
+
+def run_match( filenames, world=None, seed=42, physics=game_logic, record=None, policies=()
+             , ai_time_limit=None ):
+  # physics: anything with a tick like game_logic.tick
+  # policies: match_end policies that may end the match early
+  # ai_time_limit: seconds the ais may think per tick, None waits for them
+  # (up to engine.ai_wait_limit, see engine.call_ais), so that the same
+  # seed gives the same result
+  if world is None:
+    world = World(768, 768)
+  players, camps, goals = engine.setup_match(filenames, world, seed)
+  recorder = None
+  if record is not None:
+    recorder = replay.Recorder(record, players, goals, world, seed)
+
+  # same number of ticks as a tournament match in seekers.py
+  ticks = (engine.tournament_steps + 1) * engine.speedup_factor
+  try:
+    for tick in range(1, ticks+1):
+      engine.call_ais(players, camps, goals, world, time_limit=ai_time_limit)
+      physics.tick(players, camps, goals, None, world)
+      if recorder is not None:
+        recorder.record(players, goals)
+      if policies and match_end.decided(policies, players, goals, tick, ticks):
+        break
+  finally:
+    engine.close_ais(players)
+    if recorder is not None:
+      recorder.close()
+
+  return players
+
+def main():
+  parser = argparse.ArgumentParser(description="run a match without display")
+  parser.add_argument("bots", nargs="+", help="ai files")
+  parser.add_argument("--ai-time-limit", type=float, default=None,
+      help="seconds an ai may think per tick (default: wait for every ai,"
+           " so that the same seed always gives the same result, and stop"
+           " ais that take longer than %g seconds)" % engine.ai_wait_limit)
+  parser.add_argument("--record", metavar="FILE", help="record a replay")
+  parser.add_argument("--database", metavar="FILE",
+      help="results database to add the match to (see results.py)")
+  parser.add_argument("--end", metavar="POLICY", type=match_end.parse, action="append",
+      default=[], help="end the match early (see match_end.py), may be repeated")
+  args = parser.parse_args()
+  seed = 42
+  hashes = [replay.file_hash(f) for f in args.bots]
+  start = time.monotonic()
+  players = run_match( args.bots, seed=seed, record=args.record
+                     , policies=args.end, ai_time_limit=args.ai_time_limit )
+  duration = time.monotonic() - start
+  winner = engine.winner(players)
+  if args.database:
+    store = results.ResultsStore(args.database)
+    store.record( seed, args.bots, hashes, [p.score for p in players]
+                , players.index(winner), duration )
+    store.close()
+  print(winner.ai.filename)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,12 +1,16 @@
 from hash_color import *
 
+import copy
 import random
 import math
+import operator
 import utils
 import ctypes
 import multiprocessing as mp
 
 class Vector:
+  __slots__ = ("x", "y")
+
   def __init__(self, x=0, y=0):
     self.x = x
     self.y = y
@@ -53,6 +57,37 @@ class Vector:
   def fmap(self, f):
     return Vector(f(self.x),f(self.y))
 
+  # in-place variants, for the physics; they return the vector itself
+  def iadd(self, other):
+    self.x += other.x
+    self.y += other.y
+    return self
+
+  def isub(self, other):
+    self.x -= other.x
+    self.y -= other.y
+    return self
+
+  def add_scaled(self, other, factor):
+    self.x += other.x * factor
+    self.y += other.y * factor
+    return self
+
+  def scale(self, factor):
+    self.x *= factor
+    self.y *= factor
+    return self
+
+  def normalize(self):
+    norm = self.norm()
+    if (norm == 0):
+      self.x = 0
+      self.y = 0
+    else:
+      self.x /= norm
+      self.y /= norm
+    return self
+
 class Physical:
   mass = 1
   friction = 0.02
@@ -66,16 +101,12 @@ class Physical:
   
   def move(self,world):
     # friction
-    self.velocity.x *= 1 - self.friction
-    self.velocity.y *= 1 - self.friction
+    self.velocity.scale(1 - self.friction)
     # acceleration
     self.update_acceleration(world)
-    a = self.acceleration
-    self.velocity.x += a.x * self.thrust()
-    self.velocity.y += a.y * self.thrust()
+    self.velocity.add_scaled(self.acceleration, self.thrust())
     # displacement
-    self.position.x += self.velocity.x
-    self.position.y += self.velocity.y
+    self.position.iadd(self.velocity)
     world.normalize_position(self.position)
   
   def update_acceleration(self, world):
@@ -86,19 +117,23 @@ class Physical:
 
   def collision(s, t, world, min_dist):
     # elastic collision
+    # The pushed physicals get new vectors rather than changed ones: a
+    # seeker's target starts out as its position vector, and keeps aiming
+    # at the spot the seeker was pushed away from (collisions are rare, the
+    # few vectors don't matter).
     d = world.torus_difference(s.position,t.position)
     if d.norm() != 0:
       dn = d.normalized()
-      dv = t.velocity - s.velocity
-      dvdn = dv.dot(dn)
+      dvdn = ( (t.velocity.x - s.velocity.x) * dn.x
+             + (t.velocity.y - s.velocity.y) * dn.y )
       m = 2 / (s.mass + t.mass)
       if dvdn < 0:
-        s.velocity += dn * (m * t.mass * dvdn)
-        t.velocity -= dn * (m * s.mass * dvdn)
+        s.velocity = s.velocity + dn * (m * t.mass * dvdn)
+        t.velocity = t.velocity - dn * (m * s.mass * dvdn)
       ddn = d.dot(dn)
       if ddn < min_dist:
-        s.position += dn * (ddn - min_dist)
-        t.position -= dn * (ddn - min_dist)
+        s.position = s.position + dn * (ddn - min_dist)
+        t.position = t.position - dn * (ddn - min_dist)
 
 
 class Goal(Physical):
@@ -216,9 +251,11 @@ class Seeker(Physical):
     self.magnet.disable()
 
   def magnetic_force(self,world,pos):
+    if self.disabled():
+      return Vector(0,0)
     r = world.torus_distance(self.position,pos) / world.diameter()
     d = world.torus_direction(self.position,pos)
-    return Vector(0,0) if self.disabled() else - d * ( self.magnet.strength * utils.bump(r*10) )
+    return d.scale(- self.magnet.strength * utils.bump(r*10))
 
 
 class ScoreAnimation:
@@ -241,6 +278,8 @@ class World:
     self.width = width
     self.height = height
     self.debug_mode = debug
+    # spatial indexes of collections of physicals, see add_index
+    self.indexes = []
 
   def normalize_position(self, pos):
     pos.x -= math.floor(pos.x/self.width)*self.width
@@ -259,8 +298,9 @@ class World:
     def dist1d(l,a,b):
       delta = abs(a-b)
       return min(delta,l-delta)
-    return Vector( dist1d(self.width,right.x,left.x)
-                 , dist1d(self.height,right.y,left.y) ).norm()
+    dx = dist1d(self.width,right.x,left.x)
+    dy = dist1d(self.height,right.y,left.y)
+    return math.sqrt(dx*dx + dy*dy)
 
   def torus_difference(self, left, right):
     def diff1d(l,a,b):
@@ -270,7 +310,7 @@ class World:
                  , diff1d(self.height,left.y,right.y) )
 
   def torus_direction(self, left, right):
-    return self.torus_difference(left,right).normalized()
+    return self.torus_difference(left,right).normalize()
 
   def index_of_nearest(self,pos,positions):
     d = self.torus_distance(pos,positions[0])
@@ -283,13 +323,52 @@ class World:
     return j
 
   def nearest_goal(self,pos,goals):
-    i = self.index_of_nearest(pos,[g.position for g in goals])
-    return goals[i]
-
+    return self.nearest(pos,goals)
 
   def nearest_seeker(self,pos,seekers):
-    i = self.index_of_nearest(pos,[s.position for s in seekers])
-    return seekers[i]
+    return self.nearest(pos,seekers)
+
+  def nearest(self,pos,physicals):
+    indexed = self.index_for(physicals)
+    if indexed is not None:
+      index, exclude = indexed
+      return physicals[index.k_nearest(pos,1,exclude)[0]]
+    i = self.index_of_nearest(pos,[p.position for p in physicals])
+    return physicals[i]
+
+  def k_nearest(self,pos,physicals,k):
+    # the k physicals nearest to pos, nearest first
+    indexed = self.index_for(physicals)
+    if indexed is not None:
+      index, exclude = indexed
+      return [physicals[i] for i in index.k_nearest(pos,k,exclude)]
+    distances = [(self.torus_distance(pos,p.position), i) for i,p in enumerate(physicals)]
+    return [physicals[i] for _,i in sorted(distances)[:k]]
+
+  def within(self,pos,physicals,radius):
+    # all physicals at most radius away from pos, nearest first
+    indexed = self.index_for(physicals)
+    if indexed is not None:
+      index, exclude = indexed
+      return [physicals[i] for i in index.within(pos,radius,exclude)]
+    distances = [(self.torus_distance(pos,p.position), i) for i,p in enumerate(physicals)]
+    return [physicals[i] for d,i in sorted(distances) if d <= radius]
+
+  def add_index(self, physicals, index, exclude=None):
+    # queries about physicals (this very collection) will use index,
+    # skipping the entries of group exclude, as long as it holds the same
+    # physicals in the same order
+    # (a list rather than a dict by id, since ids change when pickled)
+    self.indexes.append((physicals, list(physicals), index, exclude))
+
+  def index_for(self, physicals):
+    for indexed, contents, index, exclude in self.indexes:
+      if indexed is physicals:
+        # ais may sort or change their lists, which the index doesn't know
+        if len(physicals) == len(contents) and all(map(operator.is_, physicals, contents)):
+          return index, exclude
+        return None
+    return None
 
 
   def random_position(self):
@@ -310,6 +389,99 @@ class World:
     n = len(players)
     return [ self.gen_camp(n, i, p) for i,p in enumerate(players) ] 
 
+class SeededWorld(World):
+  # a world whose random positions (starting positions and respawned
+  # goals) come from its own generator instead of the random module
+  def __init__(self, width, height, debug = False):
+    World.__init__(self, width, height, debug)
+    self.rng = random.Random()
+
+  def random_position(self):
+    return Vector( self.rng.uniform(0, self.width)
+                 , self.rng.uniform(0, self.height) )
+
+class SpatialIndex:
+  # Uniform grid on the torus for nearest neighbour and radius queries.
+  # The grid is built on the first query. Results are indices into
+  # physicals, ordered by distance and then by index, just like the
+  # linear scans in World. Entries can belong to contiguous groups (e.g.
+  # players), and one group can be left out of a query; the indices then
+  # refer to physicals without that group.
+
+  def __init__(self, world, physicals, groups=None):
+    self.world = world
+    self.physicals = physicals
+    self.groups = groups
+    self.cells = None
+
+  def build(self):
+    world = self.world
+    cell_size = math.sqrt(world.width * world.height / max(1, len(self.physicals)))
+    self.nx = max(1, int(world.width // cell_size))
+    self.ny = max(1, int(world.height // cell_size))
+    self.cell_width = world.width / self.nx
+    self.cell_height = world.height / self.ny
+    self.cells = {}
+    for i,p in enumerate(self.physicals):
+      self.cells.setdefault(self.cell(p.position), []).append(i)
+
+  def cell(self, pos):
+    return ( int(pos.x // self.cell_width) % self.nx
+           , int(pos.y // self.cell_height) % self.ny )
+
+  def ring(self, center, r):
+    # cells at distance r (in cells, maximum norm) from center
+    cx, cy = center
+    if r == 0:
+      return {center}
+    cells = set()
+    for d in range(-r, r+1):
+      cells.add(((cx+d) % self.nx, (cy-r) % self.ny))
+      cells.add(((cx+d) % self.nx, (cy+r) % self.ny))
+      cells.add(((cx-r) % self.nx, (cy+d) % self.ny))
+      cells.add(((cx+r) % self.nx, (cy+d) % self.ny))
+    return cells
+
+  def search(self, pos, done, exclude):
+    # visits the cells ring by ring, until done(found, bound) says that
+    # nothing at least bound away is needed
+    if self.cells is None:
+      self.build()
+    center = self.cell(pos)
+    step = min(self.cell_width, self.cell_height)
+    found = []
+    visited = set()
+    for r in range(0, max(self.nx, self.ny) // 2 + 1):
+      for c in self.ring(center, r) - visited:
+        visited.add(c)
+        for i in self.cells.get(c, ()):
+          if exclude is None or self.groups[i] != exclude:
+            d = self.world.torus_distance(pos, self.physicals[i].position)
+            found.append((d, i))
+      # everything in the rings further out is at least r*step away
+      if done(found, r * step):
+        break
+    found.sort()
+    return found
+
+  def without(self, indices, exclude):
+    # indices into physicals without the group exclude
+    if exclude is None:
+      return indices
+    start = self.groups.index(exclude)
+    count = self.groups.count(exclude)
+    return [i if i < start else i - count for i in indices]
+
+  def k_nearest(self, pos, k, exclude=None):
+    def done(found, bound):
+      return len(found) >= k and sorted(found)[k-1][0] < bound
+    found = self.search(pos, done, exclude)
+    return self.without([i for _,i in found[:k]], exclude)
+
+  def within(self, pos, radius, exclude=None):
+    found = self.search(pos, lambda found, bound: radius < bound, exclude)
+    return self.without([i for d,i in found if d <= radius], exclude)
+
 class Camp:
 
   def __init__(self, owner, position, width, height):
@@ -323,4 +495,177 @@ class Camp:
     return 2 * abs(delta.x) < self.width and 2 * abs(delta.y) < self.height
 
 
+# Read-only copies of the game state, shared by all ais in a tick.
+# Copying one (copy.copy, copy.deepcopy) gives an object of the mutable
+# class, for ais that change a copy of the game to try something out.
+
+class Frozen:
+  __slots__ = ()
+  mutable = None  # the class of copies
 
+  def __setattr__(self, name, value):
+    raise AttributeError("can't set " + name + ", this is a read-only snapshot")
+
+  def __delattr__(self, name):
+    raise AttributeError("can't delete " + name + ", this is a read-only snapshot")
+
+  def __copy__(self):
+    obj = object.__new__(self.mutable)
+    obj.__dict__.update(vars(self))
+    return obj
+
+  def __deepcopy__(self, memo):
+    obj = object.__new__(self.mutable)
+    memo[id(self)] = obj
+    for name, value in vars(self).items():
+      obj.__dict__[name] = copy.deepcopy(value, memo)
+    return obj
+
+def frozen(cls, **attrs):
+  obj = object.__new__(cls)
+  for name, value in attrs.items():
+    object.__setattr__(obj, name, value)
+  return obj
+
+class FrozenVector(Frozen, Vector):
+  __slots__ = ()
+
+  def __reduce__(self):
+    return (frozen_vector, (self.x, self.y))
+
+  def __copy__(self):
+    return Vector(self.x, self.y)
+
+  def __deepcopy__(self, memo):
+    return Vector(self.x, self.y)
+
+class FrozenMagnet(Frozen, Magnet):
+  mutable = Magnet
+
+class FrozenSeeker(Frozen, Seeker):
+  mutable = Seeker
+
+class FrozenGoal(Frozen, Goal):
+  mutable = Goal
+
+class FrozenPlayer(Frozen, Player):
+  mutable = Player
+
+  def __deepcopy__(self, memo):
+    player = Frozen.__deepcopy__(self, memo)
+    player.seekers = list(player.seekers)
+    return player
+
+class FrozenCamp(Frozen, Camp):
+  mutable = Camp
+
+class FrozenWorld(Frozen, World):
+  mutable = World
+
+  # the spatial indexes are for the snapshot's collections, not the copies'
+  def __copy__(self):
+    world = Frozen.__copy__(self)
+    world.indexes = []
+    return world
+
+  def __deepcopy__(self, memo):
+    world = object.__new__(World)
+    memo[id(self)] = world
+    World.__init__(world, self.width, self.height, self.debug_mode)
+    return world
+
+# snapshots contain many vectors, so this one is as direct as possible
+set_x = Vector.x.__set__
+set_y = Vector.y.__set__
+
+def frozen_vector(x, y):
+  v = object.__new__(FrozenVector)
+  set_x(v, x)
+  set_y(v, y)
+  return v
+
+def freeze_vector(v):
+  return frozen_vector(v.x, v.y)
+
+def freeze_physical(cls, p, **attrs):
+  return frozen( cls
+               , position=freeze_vector(p.position)
+               , velocity=freeze_vector(p.velocity)
+               , acceleration=freeze_vector(p.acceleration)
+               , **attrs )
+
+class Snapshot:
+  # Built once per tick in O(entities). Every ai gets the same frozen
+  # objects, except for its own seekers which are mutable copies, so that
+  # the ai can change their alterables. The collections are new lists for
+  # every ai, which it may sort or change.
+
+  def __init__(self, players, goals, camps, world):
+    self.players = tuple( frozen( FrozenPlayer
+                                , name=p.name
+                                , color=tuple(p.color)
+                                , score=p.score
+                                , seekers=tuple(self.freeze_seeker(s) for s in p.seekers) )
+                          for p in players )
+    owners = {id(p): f for p,f in zip(players, self.players)}
+    self.all_seekers = tuple(s for p in self.players for s in p.seekers)
+    self.goals = tuple( freeze_physical( FrozenGoal, g
+                                       , owner=owners.get(id(g.owner))
+                                       , owned_for=g.owned_for
+                                       , uid=g.uid )
+                        for g in goals )
+    self.camps = tuple( frozen( FrozenCamp
+                              , owner=owners.get(id(c.owner))
+                              , position=freeze_vector(c.position)
+                              , width=c.width
+                              , height=c.height )
+                        for c in camps )
+    self.world = frozen( FrozenWorld
+                       , width=world.width
+                       , height=world.height
+                       , debug_mode=world.debug_mode
+                       , indexes=[] )
+    # the ais' nearest neighbour queries on goals and seekers use these
+    self.goal_index = SpatialIndex(self.world, self.goals)
+    groups = [i for i,p in enumerate(self.players) for _ in p.seekers]
+    self.seeker_index = SpatialIndex(self.world, self.all_seekers, groups)
+
+  def freeze_seeker(self, s):
+    return freeze_physical( FrozenSeeker, s
+                          , uid=s.uid
+                          , target=freeze_vector(s.target)
+                          , disabled_counter=s.disabled_counter
+                          , magnet=frozen(FrozenMagnet, strength=s.magnet.strength) )
+
+  def ai_input(self, i):
+    # same order as the arguments of an ai's decide function
+    own_seekers = [mutable_copy(s) for s in self.players[i].seekers]
+    other_players = list(self.players[:i] + self.players[i+1:])
+    other_seekers = [s for p in other_players for s in p.seekers]
+    self.world.add_index(other_seekers, self.seeker_index, exclude=i)
+    start = sum(len(p.seekers) for p in self.players[:i])
+    all_seekers = ( list(self.all_seekers[:start])
+                  + own_seekers
+                  + list(self.all_seekers[start+len(own_seekers):]) )
+    self.world.add_index(all_seekers, self.seeker_index)
+    goals = list(self.goals)
+    self.world.add_index(goals, self.goal_index)
+    return ( own_seekers
+           , other_seekers
+           , all_seekers
+           , goals
+           , other_players
+           , self.camps[i]
+           , list(self.camps)
+           , self.world )
+
+def mutable_copy(seeker):
+  s = object.__new__(Seeker)
+  s.uid = seeker.uid
+  s.disabled_counter = seeker.disabled_counter
+  s.position = Vector(seeker.position.x, seeker.position.y)
+  s.velocity = Vector(seeker.velocity.x, seeker.velocity.y)
+  s.acceleration = Vector(seeker.acceleration.x, seeker.acceleration.y)
+  s.target = Vector(seeker.target.x, seeker.target.y)
+  s.magnet = Magnet(seeker.magnet.strength)
+  return s
@@ -0,0 +1,61 @@
+from seekers_types import *
+import broadcast
+import replay
+import draw
+import events
+
+import sys
+
+import pygame
+
+
+# Watches a match that a seekers.py started with --spectators ADDRESS
+# is streaming.
+# Usage: python3 src/spectator.py ADDRESS
+#
+# ADDRESS is host:port (or just port, on this machine) or a unix socket path.
+
+def main():
+  if len(sys.argv) != 2:
+    print("usage: " + sys.argv[0] + " ADDRESS", file=sys.stderr)
+    sys.exit(1)
+  stream = broadcast.Stream(sys.argv[1])
+  players, camps, goals = replay.view(stream.header)
+  world = World(stream.header["width"], stream.header["height"])
+
+  pygame.init()
+  pygame.event.set_allowed([pygame.QUIT])
+  screen = pygame.display.set_mode((world.width, world.height))
+  clock = pygame.time.Clock()
+  draw.init(players)
+
+  animations = events.ScoreAnimations()
+  before = None
+  quit = False
+  while not quit:
+    for e in pygame.event.get():
+      if e.type == pygame.QUIT:
+        quit = True
+
+    try:
+      frames = stream.update()
+    except EOFError:
+      break
+    for tick, frame in frames:
+      # goals scored since the last frame start their animations
+      after = replay.goal_uids_and_owners(frame, stream.num_seekers, stream.num_goals)
+      animations.advance(tick)
+      if before is not None:
+        for position, owner in replay.scored_goals(before, after):
+          animations.add(position, players[owner].color)
+      before = after
+    if frames:
+      replay.show(frames[-1][1], players, goals)
+    draw.draw(players, camps, goals, animations.animations, clock, world, screen)
+    clock.tick(50)
+
+  stream.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,106 @@
+import engine
+import seekers_headless
+import replay
+import results
+import match_end
+
+import sys
+import time
+import argparse
+import itertools
+import concurrent.futures
+
+
+# Runs many headless matches in parallel, one match per worker process.
+# (The workers are not daemonic, so that they can start the ai processes.)
+# Every finished match is written as one tab separated line:
+#   seed, the bots, their scores (in the same order), the winning bot
+# and, with --database, stored in a results database (see results.py).
+#
+# Usage: python3 src/tournament.py [--schedule FILE] [--output FILE]
+#          [--database FILE] [--end POLICY]... [--ai-time-limit SECONDS] BOT...
+# Without a schedule, every pair of the given bots plays once.
+# A schedule file contains one match per line, given as the bots'
+# filenames separated by whitespace.
+
+def round_robin(bots):
+  return [list(pairing) for pairing in itertools.combinations(bots, 2)]
+
+def read_schedule(filename):
+  with open(filename, "r") as f:
+    lines = [l.split() for l in f]
+  return [l for l in lines if l]
+
+def play(match):
+  filenames, seed, end, ai_time_limit = match
+  policies = [match_end.parse(e) for e in end]
+  hashes = [replay.file_hash(f) for f in filenames]
+  start = time.monotonic()
+  players = seekers_headless.run_match( filenames, seed=seed, policies=policies
+                                      , ai_time_limit=ai_time_limit )
+  duration = time.monotonic() - start
+  scores = [p.score for p in players]
+  winner = players.index(engine.winner(players))
+  return (seed, filenames, hashes, scores, winner, duration)
+
+def format_result(result):
+  seed, filenames, _, scores, winner, _ = result
+  return "\t".join([str(seed)] + filenames + [str(s) for s in scores] + [filenames[winner]])
+
+def run_tournament( schedule, output, processes=None, seed=42, store=None, end=()
+                  , ai_time_limit=None ):
+  # end: the match_end policies, as given on the command line
+  # ai_time_limit: see seekers_headless.run_match
+  matches = [(filenames, seed, end, ai_time_limit) for filenames in schedule]
+  with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+    futures = [pool.submit(play, match) for match in matches]
+    for future in concurrent.futures.as_completed(futures):
+      result = future.result()
+      print(format_result(result), file=output, flush=True)
+      if store is not None:
+        store.record(*result)
+
+def main():
+  parser = argparse.ArgumentParser(description="run headless matches in parallel")
+  parser.add_argument("bots", nargs="*", help="ai files playing round robin")
+  parser.add_argument("--schedule", help="file with one match per line")
+  parser.add_argument("--output", help="result file (default: stdout)")
+  parser.add_argument("--database", help="results database to add the matches to")
+  parser.add_argument("--processes", type=int, default=None,
+      help="number of worker processes (default: number of cores)")
+  parser.add_argument("--seed", type=int, default=42)
+  parser.add_argument("--end", metavar="POLICY", action="append", default=[],
+      help="end matches early (see match_end.py), may be repeated")
+  parser.add_argument("--ai-time-limit", type=float, default=None,
+      help="seconds an ai may think per tick (default: wait for every ai,"
+           " so that the same seed always gives the same result, and stop"
+           " ais that take longer than %g seconds)" % engine.ai_wait_limit)
+  args = parser.parse_args()
+
+  schedule = round_robin(args.bots)
+  if args.schedule:
+    schedule += read_schedule(args.schedule)
+  if not schedule:
+    parser.error("no matches to play")
+  for e in args.end:
+    try:
+      match_end.parse(e)
+    except ValueError as error:
+      parser.error(str(error))
+
+  store = results.ResultsStore(args.database) if args.database else None
+  try:
+    if args.output:
+      with open(args.output, "a") as output:
+        run_tournament( schedule, output, args.processes, args.seed
+                      , store, args.end, args.ai_time_limit )
+    else:
+      run_tournament( schedule, sys.stdout, args.processes, args.seed
+                    , store, args.end, args.ai_time_limit )
+  finally:
+    if store is not None:
+      store.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -27,6 +27,11 @@ def shuffled(xs):
 def bump(r):
   return math.exp(1 / (r**2 - 1)) if r < 1 else 0
 
+def percentiles(values, qs):
+  # the q-quantiles of values for all qs, as the value of rank q*len(values)
+  values = sorted(values)
+  return [values[min(len(values)-1, int(q * len(values)))] for q in qs]
+
 def pop_split(xs,i):
   x = xs.pop(i)
   return (x,xs)
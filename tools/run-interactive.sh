@@ -3,6 +3,6 @@
 # Later on, it will copy the user's bots to a tournament server.
 
 while :; do
-    python3 ~/seekers/src/seekers.py
+    python3 ~/seekers/src/seekers.py --dirty-rects
     sleep 0.5
 done
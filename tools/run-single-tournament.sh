@@ -32,7 +32,7 @@ bot2="$(ls -t -- $session2/ai*.py | head -n1)"
 [ -n "$bot1" ] || error "No bot for player '$player1' found."
 [ -n "$bot2" ] || error "No bot for player '$player2' found."
 
-winning_bot="$(python3 ~/seekers/src/seekers.py "$bot1" "$bot2")"
+winning_bot="$(python3 ~/seekers/src/seekers_headless.py "$bot1" "$bot2")"
 
 if [ "$winning_bot" = "$bot1" ]; then
     echo "$player1"